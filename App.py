@@ -1,102 +1,463 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+from dotenv import load_dotenv
+import hashlib
 import json
 import os
+import time
+
+load_dotenv()
 
 # Local utilities and knowledge base
-from utils.gemini_advisor import RegenerativeAdvisor
+from utils import startup
+from utils.gemini_advisor import RegenerativeAdvisor, PLAN_BATCH_CONCURRENCY, plan_stream_text
+from utils.resilience import Deadline, CircuitOpenError
 from utils.weather_service import WeatherService
-from data.kenya_agriculture import KENYA_CROPS, SOIL_TYPES, KENYAN_REGIONS
+from utils.intent_router import IntentRouter
+from utils.question_cache import QuestionCache
+from utils.chat_sessions import ChatSessionStore
+from utils.weather_snapshot import WeatherRefresher, kenyan_region_counties
+from utils import metrics
+from utils import compression
+from utils.knowledge import get_knowledge_store
+from utils.quick_tips import QuickTips, QuickTipsBuilder, QUICK_TIPS_HTTP_MAX_AGE
+from utils.suitability import get_suitability_matrix
+from utils.geocoding import get_location_index
+from utils.climate_history import get_climate_history
+from utils.admission import get_admission_controller, estimate_tokens, usage_tokens
+from utils import admission
+from utils.job_queue import JobQueue, WorkerPool, PRIORITIES, DONE, FAILED, PLAN_JOB_POLL_INTERVAL
 
 app = Flask(__name__)
-advisor = RegenerativeAdvisor()
-weather_service = WeatherService()
+
+# The Gemini model and the weather HTTP session are created on first use
+with startup.phase('init_components'):
+    knowledge = get_knowledge_store()
+    advisor = RegenerativeAdvisor()
+    weather_service = WeatherService()
+    intent_router = IntentRouter(knowledge)
+    question_cache = QuestionCache()
+    # Sessions are shared through SQLite; a worker rebuilds the Gemini chat for ones it doesn't hold
+    chat_sessions = ChatSessionStore(get_model=lambda: advisor.model)
+    quick_tips_store = QuickTips(knowledge)
+    suitability = get_suitability_matrix()
+    climate_history = get_climate_history()
+    job_queue = JobQueue()
+    # Worker processes start with the first submitted job
+    job_workers = WorkerPool()
+
+metrics.init_app(app)
+compression.init_app(app)
+metrics.register_stats('regai_plan_cache', advisor.plan_cache.stats)
+metrics.register_stats('regai_weather', lambda: weather_service.stats())
+metrics.register_stats('regai_question_cache', question_cache.stats)
+metrics.register_stats('regai_chat', chat_sessions.stats)
+metrics.register_stats('regai_startup', startup.stats)
+metrics.register_stats('regai_gemini_breaker', advisor.breaker.stats)
+metrics.register_stats('regai_quick_tips', quick_tips_store.stats)
+metrics.register_stats('regai_plan_sections', advisor.section_stats)
+metrics.register_stats('regai_suitability', suitability.stats)
+metrics.register_stats('regai_climate_history', climate_history.stats)
+metrics.register_stats('regai_plan_jobs', job_queue.stats)
+metrics.register_stats('regai_gemini_admission', get_admission_controller().stats)
+
+# Keep county weather fresh in the background so requests read it from the shared snapshot
+if os.getenv('WEATHER_REFRESH_ENABLED', '1' if weather_service.api_key else '0') == '1':
+    WeatherRefresher(weather_service, kenyan_region_counties(), history=climate_history).start()
+
+# Fill in missing or stale quick tips in the background; requests never wait for them
+if os.getenv('QUICK_TIPS_WARMUP', '1' if os.getenv('GEMINI_API_KEY') else '0') == '1':
+    QuickTipsBuilder(advisor, knowledge).start()
+
+# Load the Gemini SDK off the request path once the app can already take traffic
+if os.getenv('GEMINI_WARMUP', '1' if os.getenv('GEMINI_API_KEY') else '0') == '1':
+    advisor.warm_up()
+
+startup.mark_ready()
 
 # === Routes === #
 
+# The landing page only lists knowledge data, so it is rendered once per data version
+LANDING_PAGE_MAX_AGE = int(os.getenv('LANDING_PAGE_MAX_AGE', 300))
+_landing_pages = {}
+
+def landing_page():
+    """(html, etag) for index.html at the current knowledge version"""
+    page = _landing_pages.get(knowledge.version)
+    if page is None:
+        html = render_template(
+            'index.html',
+            crops=knowledge.crops(),
+            soil_types=knowledge.soils(),
+            regions=knowledge.featured_regions
+        )
+        page = _landing_pages[knowledge.version] = (html, hashlib.sha256(html.encode('utf-8')).hexdigest()[:16])
+    return page
+
 @app.route('/')
 def home():
     """Main landing page"""
-    return render_template(
-        'index.html',
-        crops=list(KENYA_CROPS.keys()),
-        soil_types=list(SOIL_TYPES.keys()),
-        regions=KENYAN_REGIONS
-    )
+    html, etag = landing_page()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(html, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={LANDING_PAGE_MAX_AGE}'
+    return response
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe with startup timings; lazy components don't block readiness"""
+    report = startup.report()
+    # An open circuit doesn't make the app unready: requests are served from fallbacks
+    report['circuits'] = {'gemini': advisor.breaker.state}
+    return jsonify(report), 200 if report['ready'] else 503
 
 @app.route('/generate-plan', methods=['POST'])
 def generate_plan():
     """Generate regenerative agriculture plan"""
+    # Weather and Gemini share one time budget so the response time stays bounded
+    deadline = Deadline()
     try:
         # Get form data
-        farm_data = {
-            'location': request.json.get('location', ''),
-            'size': request.json.get('size', ''),
-            'crops': request.json.get('crops', ''),
-            'soil_type': request.json.get('soil_type', ''),
-            'experience': request.json.get('experience', 'beginner'),
-            'goals': request.json.get('goals', '')
-        }
+        farm_data = read_farm_data(request.json)
 
         # Get weather data
-        weather_data = weather_service.get_location_weather(farm_data['location'])
+        weather_data = weather_service.get_location_weather(farm_data['location'], deadline)
 
         # Generate AI plan
-        regenerative_plan = advisor.generate_farming_plan(farm_data, weather_data)
+        regenerative_plan = advisor.generate_farming_plan(farm_data, weather_data, deadline)
 
-        return jsonify({
-            'success': True,
-            'plan': regenerative_plan,
-            'weather': weather_data,
-            'farm_info': farm_data
-        })
+        with metrics.timed('response_render'):
+            return jsonify({
+                'success': True,
+                # Markdown, or HTML rendered once on the server with format=html; never both
+                **plan_fields(regenerative_plan, wants_plan_html(request.json, request.args)),
+                'weather': weather_data,
+                # Seasonal rainfall from local history; no network call
+                'climate': climate_history.summary(farm_data['location']),
+                'farm_info': farm_data
+            })
 
     except Exception as e:
+        metrics.count_error('generate_plan', e)
         return jsonify({
             'success': False,
             'error': f"Error generating plan: {str(e)}"
         }), 500
 
-@app.route('/quick-tips', methods=['POST'])
+@app.route('/generate-plan/stream', methods=['POST'])
+def generate_plan_stream():
+    """Stream the regenerative plan as Server-Sent Events
+
+    With format=html, whole sections go out pre-rendered as {'html'} and
+    the section being written as {'text'} pieces closed by {'end'};
+    otherwise every chunk is plain {'text'}.
+    """
+    farm_data = read_farm_data(request.json)
+    as_html = wants_plan_html(request.json, request.args)
+    deadline = Deadline()
+
+    def events():
+        try:
+            weather_data = weather_service.get_location_weather(farm_data['location'], deadline)
+            yield sse_event('weather', weather_data)
+
+            for kind, value in advisor.stream_farming_plan(farm_data, weather_data, deadline):
+                if not as_html:
+                    chunk = {'text': plan_stream_text(kind, value)}
+                elif kind == 'section':
+                    chunk = {'html': advisor.plan_html(value, fragment=True)}
+                elif kind == 'end':
+                    # The section's text already went out; don't send it a second time as HTML
+                    chunk = {'end': True}
+                else:
+                    chunk = {'text': value}
+                yield sse_event('chunk', chunk)
+
+            yield sse_event('done', {'farm_info': farm_data})
+        except Exception as e:
+            metrics.count_error('generate_plan_stream', e)
+            yield sse_event('error', {'error': f"Error generating plan: {str(e)}"})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/jobs/generate-plan', methods=['POST'])
+def submit_plan_job():
+    """Queue a plan and return its job id at once; identical in-flight requests share one job"""
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+    priority = data.get('priority', 'normal')
+    if priority not in PRIORITIES:
+        return jsonify({'success': False, 'error': f"priority must be one of {', '.join(PRIORITIES)}"}), 400
+
+    job_workers.ensure_started()
+    job, merged = job_queue.submit({'farm_data': read_farm_data(data)}, priority)
+    return jsonify({
+        'success': True,
+        'job_id': job['id'],
+        'status': job['status'],
+        'merged': merged,
+        'poll': f"/jobs/{job['id']}",
+        'events': f"/jobs/{job['id']}/events"
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def get_plan_job(job_id):
+    """Job status, with the plan once it is done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    if job['result']:
+        job['result'] = plan_result(job['result'], wants_plan_html(None, request.args))
+    return jsonify(dict(job, success=True))
+
+@app.route('/jobs/<job_id>/events')
+def plan_job_events(job_id):
+    """Stream status changes as Server-Sent Events until the job finishes"""
+    if job_queue.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Unknown or expired job'}), 404
+    as_html = wants_plan_html(None, request.args)
+
+    def events():
+        status = None
+        last_sent = time.monotonic()
+        while True:
+            job = job_queue.get(job_id)
+            if job is None:
+                yield sse_event('error', {'error': 'Unknown or expired job'})
+                return
+            if job['status'] != status:
+                status = job['status']
+                last_sent = time.monotonic()
+                if status == DONE:
+                    yield sse_event('done', plan_result(job['result'], as_html))
+                    return
+                if status == FAILED:
+                    yield sse_event('error', {'error': f"Error generating plan: {job['error']}"})
+                    return
+                yield sse_event('status', {'status': status, 'attempts': job['attempts']})
+            elif time.monotonic() - last_sent > 15:
+                # Comment line so proxies don't close an idle stream
+                last_sent = time.monotonic()
+                yield ': keep-alive\n\n'
+            time.sleep(PLAN_JOB_POLL_INTERVAL)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/generate-plans/batch', methods=['POST'])
+def generate_plans_batch():
+    """Generate plans for a whole cooperative, streamed back as JSON lines"""
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+    profiles = data.get('profiles')
+    if not isinstance(profiles, list) or not profiles:
+        return jsonify({
+            'success': False,
+            'error': "Request must include a non-empty 'profiles' list"
+        }), 400
+
+    for index, profile in enumerate(profiles):
+        if not isinstance(profile, dict):
+            return jsonify({
+                'success': False,
+                'error': f"Profile {index} must be a JSON object"
+            }), 400
+
+    farm_profiles = [read_farm_data(profile) for profile in profiles]
+    try:
+        concurrency = int(data.get('concurrency', PLAN_BATCH_CONCURRENCY))
+    except (TypeError, ValueError):
+        concurrency = PLAN_BATCH_CONCURRENCY
+    # Callers may lower the Gemini concurrency but never raise it above the quota-safe limit
+    concurrency = max(1, min(concurrency, PLAN_BATCH_CONCURRENCY))
+
+    def lines():
+        try:
+            # Cooperative batches queue behind interactive traffic for Gemini quota
+            with admission.priority('bulk'):
+                results = advisor.generate_farming_plans(
+                    farm_profiles, weather_service.get_location_weather, max_workers=concurrency
+                )
+                for index, weather_data, plan in results:
+                    yield json.dumps({
+                        'index': index,
+                        'success': True,
+                        'plan': plan,
+                        'weather': weather_data,
+                        'farm_info': farm_profiles[index]
+                    }) + "\n"
+        except Exception as e:
+            metrics.count_error('generate_plans_batch', e)
+            yield json.dumps({
+                'success': False,
+                'error': f"Error generating plans: {str(e)}"
+            }) + "\n"
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+@app.route('/quick-tips', methods=['GET', 'POST'])
 def quick_tips():
-    """Generate quick regenerative tips"""
-    crop = request.json.get('crop', 'maize')
-    soil = request.json.get('soil', 'loamy')
+    """Serve precomputed regenerative tips; never waits on Gemini"""
+    params = request.args if request.method == 'GET' else (request.json or {})
+    crop = params.get('crop', 'maize')
+    soil = params.get('soil', 'loamy')
 
-    prompt = f"""Give 3 practical regenerative agriculture tips for {crop} farming on {soil} soil in Kenya. Each tip should be one clear sentence."""
+    entry = quick_tips_store.get(crop, soil)
+    if entry['source'] == 'local':
+        metrics.count_fallback('quick_tips')
 
+    if request.method == 'GET' and request.if_none_match.contains_weak(entry['etag']):
+        response = Response(status=304)
+    else:
+        response = jsonify({'tips': entry['tips'], 'source': entry['source'], 'generated_at': entry['generated_at']})
+    response.set_etag(entry['etag'])
+    response.headers['Cache-Control'] = f'public, max-age={QUICK_TIPS_HTTP_MAX_AGE}'
+    return response
+
+@app.route('/recommendations')
+def recommendations():
+    """Crops ranked by suitability for a location, or counties ranked for ?crop="""
     try:
-        model = advisor.model
-        response = model.generate_content(prompt)
-        return jsonify({'tips': response.text})
-    except Exception:
-        return jsonify({'tips': 'Tips temporarily unavailable. Please try the full plan generator.'})
+        limit = max(1, int(request.args.get('limit', 5)))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be a whole number'}), 400
+
+    crop = request.args.get('crop')
+    if crop:
+        counties = suitability.for_crop(crop, limit)
+        if not counties:
+            return jsonify({'success': False, 'error': f'Unknown crop: {crop}'}), 404
+        return jsonify({'success': True, 'crop': crop, 'counties': counties})
+
+    place = get_location_index().resolve(request.args.get('location', ''))
+    return jsonify({
+        'success': True,
+        'location': {'county': place.county, 'region': place.region, 'matched': place.matched},
+        'profile': knowledge.county_profile(place.county),
+        'crops': suitability.for_county(place.county, limit),
+    })
+
+@app.route('/chat/session', methods=['POST'])
+def create_chat_session():
+    """Store the plan once and return a session id for follow-up questions"""
+    plan_text = (request.json or {}).get('plan', '')
+    try:
+        session = chat_sessions.create(advisor.model, plan_text)
+    except Exception as e:
+        metrics.count_error('chat_session', e)
+        return jsonify({'success': False, 'error': 'Chat is unavailable right now.'}), 503
+    return jsonify({'success': True, 'session_id': session.id, 'summary': session.summary})
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    """Handle chatbot questions using Gemini AI"""
+    """Handle chatbot questions, answering common ones locally before asking Gemini AI"""
     data = request.json
     question = data.get('question', '')
-    plan_context = data.get('plan', '') # This can be used to give the AI more context if needed
+    session_id = data.get('session_id')
+    session = chat_sessions.get(session_id)
+    if session_id and session is None:
+        # Expired or evicted everywhere: the client re-creates it from the plan
+        return jsonify({'reply': None, 'source': 'session_expired'}), 404
+
+    plan_context = session.summary if session else data.get('plan', '') # This can be used to give the AI more context if needed
+
+    local_match = intent_router.route(question)
+    if local_match.confident:
+        return jsonify({'reply': local_match.answer, 'source': 'local', 'intent': local_match.intent})
 
+    cached_reply = question_cache.get(question, plan_context)
+    if cached_reply is not None:
+        return jsonify({'reply': cached_reply, 'source': 'cache'})
+
+    deadline = Deadline()
     try:
-        model = advisor.model
+        # A farmer is waiting on the reply, so chat goes ahead of plan and bulk work for quota
+        with admission.priority('interactive'):
+            if session is not None:
+                # Multi-turn: Gemini keeps the conversation, so only the new question is sent
+                with metrics.timed('llm_call'):
+                    reply = advisor.call_gemini(lambda: session.ask(question), deadline,
+                                                tokens=session.estimated_tokens(question))
+            else:
+                # Prepare the prompt for the AI model
+                prompt = build_chat_prompt(question, plan_context)
+
+                # Call the Gemini AI model to generate a response
+                tokens = estimate_tokens(prompt)
+                with metrics.timed('llm_call'):
+                    response = advisor.call_gemini(lambda: advisor.model.generate_content(prompt), deadline,
+                                                   hedge=True, tokens=tokens)
+                advisor.admission.settle(tokens, usage_tokens(response))
+                chat_sessions.log_stateless_turn(prompt, response)
+                reply = response.text
+
+        question_cache.put(question, reply, plan_context)
         
-        # Prepare the prompt for the AI model
-        prompt = f"""You are a helpful chatbot for a regenerative agriculture advisor app in Kenya. Your goal is to provide concise, friendly, and practical advice to small-scale farmers based on their questions.
+        return jsonify({'reply': reply, 'source': 'gemini'})
+    
+    except Exception as e:
+        if not isinstance(e, CircuitOpenError):
+            metrics.count_error('gemini', e)
+        metrics.count_fallback('chat')
+        if local_match.intent:
+            return jsonify({'reply': local_match.answer, 'source': 'local_fallback', 'intent': local_match.intent})
+        return jsonify({
+            'reply': 'Sorry, I am unable to provide a response right now. Please try again later.',
+            'source': 'unavailable'
+        })
+
+# === Helper Functions === #
+
+def read_farm_data(data):
+    """Extract the farm profile from a JSON payload"""
+    return {
+        'location': data.get('location', ''),
+        'size': data.get('size', ''),
+        'crops': data.get('crops', ''),
+        'soil_type': data.get('soil_type', ''),
+        'experience': data.get('experience', 'beginner'),
+        'goals': data.get('goals', '')
+    }
+
+def build_chat_prompt(question, plan_context):
+    """Prompt for an open-ended chatbot question"""
+    return f"""You are a helpful chatbot for a regenerative agriculture advisor app in Kenya. Your goal is to provide concise, friendly, and practical advice to small-scale farmers based on their questions.
         
         Context about the user's farm plan: {plan_context}
         
         User's question: {question}
         
         Provide a relevant and helpful response."""
-        
-        # Call the Gemini AI model to generate a response
-        response = model.generate_content(prompt)
-        
-        return jsonify({'reply': response.text})
-    
-    except Exception as e:
-        return jsonify({'reply': 'Sorry, I am unable to provide a response right now. Please try again later.'})
+
+def wants_plan_html(data, args):
+    """Whether the client asked for the plan as HTML (format=html in the query or JSON body)"""
+    body_format = data.get('format') if isinstance(data, dict) else None
+    return (args.get('format') or body_format) == 'html'
+
+def plan_fields(plan, as_html):
+    """The plan as markdown or as server-rendered HTML; sending both would double the bytes"""
+    return {'plan_html': advisor.plan_html(plan)} if as_html else {'plan': plan}
+
+def plan_result(result, as_html):
+    """A finished job's result with the plan in the requested form"""
+    result = dict(result)
+    result.update(plan_fields(result.pop('plan'), as_html))
+    return result
+
+def sse_event(event, data):
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
 if __name__ == '__main__':
@@ -0,0 +1,170 @@
+# asgi.py
+"""ASGI entry point: /generate-plan and /chat run on the event loop, every other route is served by the Flask app
+
+Run with:  uvicorn asgi:application --workers 2
+
+Each process can hold hundreds of in-flight Gemini and OpenWeather calls
+without tying up a thread per request; GEMINI_MAX_CONCURRENCY caps how many
+Gemini calls are outstanding at once. The sync Flask app in App.py is
+unchanged and still works under gunicorn.
+"""
+import json
+import time
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+
+import App
+from utils import metrics, admission, compression
+from utils.admission import estimate_tokens, usage_tokens
+from utils.gemini_advisor import gemini_limiter
+from utils.resilience import Deadline, CircuitOpenError
+
+flask_application = WsgiToAsgi(App.app)
+
+
+async def generate_plan(data, args):
+    """Async equivalent of App.generate_plan"""
+    deadline = Deadline()
+    try:
+        farm_data = App.read_farm_data(data)
+        weather_data = await App.weather_service.get_location_weather_async(farm_data['location'], deadline)
+        regenerative_plan = await App.advisor.generate_farming_plan_async(farm_data, weather_data, deadline)
+        return 200, {
+            'success': True,
+            **App.plan_fields(regenerative_plan, App.wants_plan_html(data, args)),
+            'weather': weather_data,
+            'climate': App.climate_history.summary(farm_data['location']),
+            'farm_info': farm_data
+        }
+    except Exception as e:
+        metrics.count_error('generate_plan', e)
+        return 500, {
+            'success': False,
+            'error': f"Error generating plan: {str(e)}"
+        }
+
+
+async def chat(data, args):
+    """Async equivalent of App.chat"""
+    question = data.get('question', '')
+    session_id = data.get('session_id')
+    session = App.chat_sessions.get(session_id)
+    if session_id and session is None:
+        return 404, {'reply': None, 'source': 'session_expired'}
+
+    plan_context = session.summary if session else data.get('plan', '')
+
+    local_match = App.intent_router.route(question)
+    if local_match.confident:
+        return 200, {'reply': local_match.answer, 'source': 'local', 'intent': local_match.intent}
+
+    cached_reply = App.question_cache.get(question, plan_context)
+    if cached_reply is not None:
+        return 200, {'reply': cached_reply, 'source': 'cache'}
+
+    deadline = Deadline()
+    try:
+        with admission.priority('interactive'):
+            if session is not None:
+                async def ask():
+                    async with gemini_limiter:
+                        return await session.ask_async(question)
+
+                with metrics.timed('llm_call'):
+                    reply = await App.advisor.call_gemini_async(
+                        ask, deadline, tokens=session.estimated_tokens(question))
+            else:
+                prompt = App.build_chat_prompt(question, plan_context)
+                tokens = estimate_tokens(prompt)
+
+                async def generate():
+                    async with gemini_limiter:
+                        return await App.advisor.model.generate_content_async(prompt)
+
+                with metrics.timed('llm_call'):
+                    response = await App.advisor.call_gemini_async(generate, deadline, tokens)
+                App.advisor.admission.settle(tokens, usage_tokens(response))
+                App.chat_sessions.log_stateless_turn(prompt, response)
+                reply = response.text
+        App.question_cache.put(question, reply, plan_context)
+        return 200, {'reply': reply, 'source': 'gemini'}
+    except Exception as e:
+        if not isinstance(e, CircuitOpenError):
+            metrics.count_error('gemini', e)
+        metrics.count_fallback('chat')
+        if local_match.intent:
+            return 200, {'reply': local_match.answer, 'source': 'local_fallback', 'intent': local_match.intent}
+        return 200, {
+            'reply': 'Sorry, I am unable to provide a response right now. Please try again later.',
+            'source': 'unavailable'
+        }
+
+
+ASYNC_ROUTES = {
+    '/generate-plan': generate_plan,
+    '/chat': chat,
+}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_json(send, status, payload, accept_encoding=None):
+    body = json.dumps(payload).encode('utf-8')
+    headers = [(b'content-type', b'application/json'), (b'vary', b'Accept-Encoding')]
+    encoding = compression.choose_encoding(accept_encoding)
+    if encoding and compression.compressible('application/json', len(body)):
+        body = compression.compress(body, encoding)
+        headers.append((b'content-encoding', encoding.encode()))
+    headers.append((b'content-length', str(len(body)).encode()))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def application(scope, receive, send):
+    handler = None
+    if scope['type'] == 'http' and scope['method'] == 'POST':
+        handler = ASYNC_ROUTES.get(scope['path'])
+
+    if handler is None:
+        if scope['type'] == 'lifespan':
+            return await lifespan(receive, send)
+        return await flask_application(scope, receive, send)
+
+    start = time.perf_counter()
+    metrics.current_route.set(scope['path'])
+    try:
+        data = json.loads(await read_body(receive) or b'{}')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        status, payload = 400, {'success': False, 'error': 'Request body must be a JSON object'}
+    else:
+        args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        status, payload = await handler(data, args)
+
+    with metrics.timed('response_render'):
+        accept_encoding = dict(scope.get('headers', [])).get(b'accept-encoding', b'').decode('latin-1')
+        await send_json(send, status, payload, accept_encoding)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, route=scope['path'], method='POST', status=status)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
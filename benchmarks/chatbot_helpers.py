@@ -0,0 +1,39 @@
+# benchmarks/chatbot_helpers.py
+"""Micro-benchmarks for the rule-based helpers in chatbot.py
+
+Run from the project root:  python -m benchmarks.chatbot_helpers
+"""
+import timeit
+
+import chatbot
+
+PLAN_ARGS = ('Nakuru', 2.5, 'maize', 'clay', 'beginner', 'increase_yield')
+
+
+def bench(label, func, number=20000, repeat=5):
+    """Best-of-repeat cost of one call, in microseconds"""
+    best = min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+    print(f"{label:<40} {best:8.2f} us/call")
+    return round(best, 3)
+
+
+def main():
+    """Run every micro-benchmark; returns {name: microseconds per call}"""
+    return {
+        'generate_farming_plan': bench(
+            'generate_farming_plan (precompiled)',
+            lambda: chatbot.generate_farming_plan(*PLAN_ARGS)),
+        'generate_farming_plan_uncached': bench(
+            'generate_farming_plan (uncached combo)',
+            lambda: chatbot.generate_farming_plan('Nakuru', 2.5, 'cassava', 'peat', 'beginner', 'increase_yield')),
+        'generate_chatbot_response': bench(
+            'generate_chatbot_response',
+            lambda: chatbot.generate_chatbot_response('how do I improve my soil')),
+        'get_weather_info': bench(
+            'get_weather_info',
+            lambda: chatbot.get_weather_info('Nakuru')),
+    }
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/climate_history.py
+"""Climate history ingest and query cost for 30 years of daily data in every county
+
+Run from the project root:  python -m benchmarks.climate_history
+"""
+import datetime
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.chatbot_helpers import bench
+from utils.climate_history import ClimateHistory
+from utils.geocoding import get_location_index
+
+
+def synthetic_rows(counties, years=30, seed=0):
+    """Daily rows with two rainy seasons a year for every county"""
+    rng = np.random.default_rng(seed)
+    first = datetime.date.today() - datetime.timedelta(days=365 * years)
+    days = [first + datetime.timedelta(days=i) for i in range(365 * years)]
+    wet = np.array([day.month in (3, 4, 5, 10, 11, 12) for day in days])
+    for county in counties:
+        rainfall = rng.gamma(0.6, 8.0, len(days)) * np.where(wet, 1.0, 0.2)
+        temperature = rng.normal(21, 2, len(days))
+        for day, rain, temp in zip(days, rainfall.tolist(), temperature.tolist()):
+            yield {'county': county, 'date': day, 'rainfall_mm': rain, 'temperature_c': temp, 'humidity_pct': 60}
+
+
+def main(years=30):
+    """Returns {step: microseconds per call}; ingest is reported once, in seconds"""
+    counties = list(get_location_index().counties)
+    with tempfile.TemporaryDirectory() as path:
+        history = ClimateHistory(path)
+        start = time.perf_counter()
+        stored = history.ingest_rows(synthetic_rows(counties, years))
+        ingest_seconds = time.perf_counter() - start
+        print(f"-- ingested {stored} rows for {len(counties)} counties in {ingest_seconds:.2f}s")
+
+        def uncached_summary():
+            history._summaries.clear()
+            return history.summary('Nakuru')
+
+        return {
+            'ingest_seconds': round(ingest_seconds, 3),
+            'series': bench('series (one season)', lambda: history.series('Nakuru', '2020-03-01', '2020-06-01')),
+            'summary': bench('summary (uncached)', uncached_summary, number=500),
+            'outlook': bench('outlook (cached summary)', lambda: history.outlook('Nakuru')),
+            'record': bench('record (append-on-refresh)', lambda: history.record(
+                'Nakuru', {'temperature': 22.0, 'humidity': 60, 'rainfall': 0.4}, interval=900), number=500),
+        }
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/knowledge_store.py
+"""Knowledge store lookup latency as the dataset grows
+
+Indexed lookups stay flat; search cost follows the number of practices
+that match the query (every synthetic variant here repeats the same words).
+
+Run from the project root:  python -m benchmarks.knowledge_store
+"""
+import copy
+import json
+
+from benchmarks.chatbot_helpers import bench
+from utils.geocoding import get_location_index
+from utils.knowledge import KENYA_KNOWLEDGE_PATH, KnowledgeStore
+
+
+def scaled_data(data, factor):
+    """Copy of the knowledge data with `factor` variants of every crop and soil"""
+    scaled = copy.deepcopy(data)
+    for section in ('crops', 'soils'):
+        for name, profile in data[section].items():
+            for i in range(1, factor):
+                variant = copy.deepcopy(profile)
+                for topic, lines in variant.get('practices', {}).items():
+                    variant['practices'][topic] = [f'{line} variety{i}' for line in lines]
+                scaled[section][f'{name}_v{i}'] = variant
+    return scaled
+
+
+def main(factors=(1, 10, 100)):
+    """Returns {factor: {lookup: microseconds per call}}"""
+    with open(KENYA_KNOWLEDGE_PATH, encoding='utf-8') as f:
+        data = json.load(f)
+    counties = get_location_index().counties
+
+    results = {}
+    for factor in factors:
+        store = KnowledgeStore(scaled_data(data, factor), counties)
+        print(f"-- {factor}x: {len(store.crops())} crops, {len(store.practices())} practices")
+        results[factor] = {
+            'crop': bench('crop', lambda: store.crop('maize')),
+            'practices_by_topic': bench('practices_by_topic', lambda: store.practices_by_topic(crop='maize')),
+            'crops_with_cover': bench('crops_with_cover', lambda: store.crops_with_cover('mucuna')),
+            'county': bench('county', lambda: store.county('Nakuru County')),
+            'search': bench('search', lambda: store.search('rhizobium inoculant'), number=2000),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    main()
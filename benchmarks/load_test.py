@@ -0,0 +1,187 @@
+# benchmarks/load_test.py
+"""Offline load test for App.py against stub Gemini and OpenWeather backends
+
+Run from the project root, e.g.:
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --output bench.json
+    python -m benchmarks.load_test --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.stubs import LatencyProfile, StubGeminiServer, StubWeatherServer, StubGeminiModel
+
+CROPS = ['maize', 'beans', 'sorghum', 'sweet_potato']
+SOILS = ['clay', 'loamy', 'sandy', 'volcanic', 'black_cotton']
+COUNTIES = ['Nakuru', 'Kiambu', 'Machakos', 'Kakamega', 'Kisumu', 'Meru', 'Uasin Gishu', 'Kitui']
+QUESTIONS = [
+    'how do I improve my soil',
+    'when should I plant maize in the long rains and how much compost do I need for two acres',
+    'what cover crop works after beans on clay soil near a river with frequent flooding',
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'rps': round((len(latencies) + errors) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def scenario_payloads(name, count, unique):
+    """Request bodies for a route; unique=True defeats the plan and answer caches"""
+    for i in range(count):
+        variant = i if unique else i % 8
+        if name == '/generate-plan':
+            yield {
+                'location': COUNTIES[variant % len(COUNTIES)],
+                'size': str(1 + variant * 0.1 if unique else 2.5),
+                'crops': CROPS[variant % len(CROPS)],
+                'soil_type': SOILS[variant % len(SOILS)],
+            }
+        elif name == '/quick-tips':
+            yield {'crop': CROPS[variant % len(CROPS)], 'soil': SOILS[variant % len(SOILS)]}
+        else:
+            question = QUESTIONS[variant % len(QUESTIONS)]
+            yield {'question': f'{question} (farm {variant})' if unique else question}
+
+
+def drive(base_url, route, payloads, concurrency):
+    local = threading.local()
+
+    def call(payload):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(base_url + route, json=payload, timeout=120)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, payloads))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for ok, latency in results if ok]
+    return summarize(latencies, len(results) - len(latencies), elapsed)
+
+
+def start_app(gemini_url, weather_url, workdir):
+    """Import App.py with caches in a scratch directory and the stubs injected"""
+    os.environ['PLAN_CACHE_PATH'] = os.path.join(workdir, 'plans.sqlite3')
+    os.environ['WEATHER_SNAPSHOT_PATH'] = os.path.join(workdir, 'weather_snapshot.json')
+    os.environ['QUICK_TIPS_PATH'] = os.path.join(workdir, 'quick_tips.json')
+    os.environ['GEMINI_QUOTA_PATH'] = os.path.join(workdir, 'gemini_quota.sqlite3')
+    os.environ['PLAN_JOBS_PATH'] = os.path.join(workdir, 'plan_jobs.sqlite3')
+    os.environ['CHAT_SESSION_PATH'] = os.path.join(workdir, 'chat_sessions.sqlite3')
+    os.environ['CLIMATE_HISTORY_DIR'] = os.path.join(workdir, 'climate')
+    os.environ['WEATHER_REFRESH_ENABLED'] = '0'
+    # Importing App must not reach real Gemini (a key in .env would), before the stub is injected
+    os.environ['QUICK_TIPS_WARMUP'] = '0'
+    os.environ['GEMINI_WARMUP'] = '0'
+    os.environ['OPENWEATHER_BASE_URL'] = weather_url
+
+    import App
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    App.advisor.model = StubGeminiModel(gemini_url)
+    App.weather_service.base_url = weather_url
+
+    server = make_server('127.0.0.1', 0, App.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def compare(current, baseline_path):
+    """Print p50/p99/rps changes against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    for route, stats in current['routes'].items():
+        old = baseline.get('routes', {}).get(route)
+        if not old:
+            continue
+        print(f"{route:<18} rps {old['rps']:>8} -> {stats['rps']:<8} "
+              f"p50 {old['p50_ms']:>8} -> {stats['p50_ms']:<8} p99 {old['p99_ms']:>8} -> {stats['p99_ms']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--routes', default='/generate-plan,/quick-tips,/chat')
+    parser.add_argument('--unique', action='store_true', help='vary every payload so caches miss')
+    parser.add_argument('--gemini-ms', type=float, default=200.0, help='median stub Gemini latency')
+    parser.add_argument('--gemini-errors', type=float, default=0.0, help='stub Gemini error rate (0-1)')
+    parser.add_argument('--weather-ms', type=float, default=80.0, help='median stub OpenWeather latency')
+    parser.add_argument('--weather-errors', type=float, default=0.0, help='stub OpenWeather error rate (0-1)')
+    parser.add_argument('--sigma', type=float, default=0.5, help='log-normal spread of stub latencies')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--micro', action='store_true', help='also run chatbot.py micro-benchmarks')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    parser.add_argument('--compare', help='compare against an earlier results JSON file')
+    args = parser.parse_args(argv)
+
+    gemini = StubGeminiServer(LatencyProfile(args.gemini_ms, args.sigma, args.gemini_errors, args.seed)).start()
+    weather = StubWeatherServer(LatencyProfile(args.weather_ms, args.sigma, args.weather_errors, args.seed)).start()
+    workdir = tempfile.mkdtemp(prefix='regai-bench-')
+    server, base_url = start_app(gemini.url, weather.url, workdir)
+
+    results = {
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'routes': {},
+    }
+    try:
+        for route in [r for r in args.routes.split(',') if r]:
+            payloads = list(scenario_payloads(route, args.requests, args.unique))
+            results['routes'][route] = stats = drive(base_url, route, payloads, args.concurrency)
+            print(f"{route:<18} {stats['rps']:>8} req/s  p50 {stats['p50_ms']:>8} ms  "
+                  f"p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  errors {stats['errors']}")
+    finally:
+        server.shutdown()
+        gemini.stop()
+        weather.stop()
+
+    if args.micro:
+        from benchmarks import chatbot_helpers
+        results['micro'] = chatbot_helpers.main()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/stubs.py
+"""Local stand-ins for Gemini and OpenWeather with configurable latency and error rates"""
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+STUB_PLAN = """## 🔄 CROP ROTATION STRATEGY
+• Rotate maize with beans each season
+## 🌱 COVER CROP RECOMMENDATIONS
+• Plant lablab and mucuna during fallow
+## 🪱 SOIL HEALTH IMPROVEMENT
+• Build a compost heap from crop residues
+"""
+
+
+class LatencyProfile:
+    """Log-normal latency around a median, plus a probability of failing the call"""
+
+    def __init__(self, median_ms=50.0, sigma=0.5, error_rate=0.0, seed=None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """Returns (delay in seconds, whether this call should fail)"""
+        with self._lock:
+            delay = self.median_ms / 1000.0 * self._random.lognormvariate(0, self.sigma)
+            fail = self._random.random() < self.error_rate
+        return delay, fail
+
+
+class _StubServer:
+    handler_class = None
+
+    def __init__(self, profile, host='127.0.0.1', port=0):
+        handler = type('Handler', (self.handler_class,), {'profile': profile})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    profile = None
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self):
+        delay, fail = self.profile.sample()
+        time.sleep(delay)
+        if fail:
+            self._reply(503, {'error': 'stubbed upstream failure'})
+        return not fail
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _GeminiHandler(_StubHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        if self._simulate():
+            self._reply(200, {'text': STUB_PLAN})
+
+
+class _WeatherHandler(_StubHandler):
+    def do_GET(self):
+        if self._simulate():
+            self._reply(200, {
+                'main': {'temp': 21.4, 'humidity': 63},
+                'weather': [{'description': 'scattered clouds'}],
+                'rain': {'1h': 0.2},
+            })
+
+
+class StubGeminiServer(_StubServer):
+    handler_class = _GeminiHandler
+
+
+class StubWeatherServer(_StubServer):
+    """Answers OpenWeather's /weather endpoint; point WeatherService.base_url at .url"""
+    handler_class = _WeatherHandler
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubGeminiModel:
+    """Drop-in for genai.GenerativeModel that calls the stub server instead of Gemini"""
+
+    def __init__(self, url, timeout=60):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        response = self.session.post(f'{self.url}/generate', json={'prompt': prompt}, timeout=self.timeout)
+        response.raise_for_status()
+        text = response.json()['text']
+        if stream:
+            return [_StubResponse(line + '\n') for line in text.splitlines()]
+        return _StubResponse(text)
+
+    def start_chat(self, history=None):
+        return _StubChat(self)
+
+
+class _StubChat:
+    """Mimics genai.ChatSession.send_message on top of the stub model"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def send_message(self, content, **kwargs):
+        return self.model.generate_content(content)
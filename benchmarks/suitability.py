@@ -0,0 +1,60 @@
+# benchmarks/suitability.py
+"""Scoring cost of the crop × county suitability matrix as varieties and locations grow
+
+Compares the vectorized score_matrix() with the same maths in a Python loop.
+
+Run from the project root:  python -m benchmarks.suitability
+"""
+import numpy as np
+
+from benchmarks.chatbot_helpers import bench
+from utils.suitability import (score_matrix, SUITABILITY_PH_TOLERANCE, SUITABILITY_DRY_TOLERANCE,
+                               SUITABILITY_WET_TOLERANCE)
+
+
+def synthetic_inputs(crops, counties, seed=0):
+    """Random but plausible pH and rainfall ranges for `crops` varieties and `counties` locations"""
+    rng = np.random.default_rng(seed)
+    ph_low = rng.uniform(5.0, 7.0, crops)
+    rain_low = rng.uniform(250, 900, crops)
+    crop_ph = np.column_stack([ph_low, ph_low + rng.uniform(0.5, 2.0, crops)])
+    crop_rainfall = np.column_stack([rain_low, rain_low + rng.uniform(200, 800, crops)])
+    return crop_ph, crop_rainfall, rng.uniform(4.5, 8.5, counties), rng.uniform(150, 2000, counties)
+
+
+def _fit(value, low, high, below, above):
+    return min(1.0, max(0.0, 1 - max(low - value, 0) / below - max(value - high, 0) / above))
+
+
+def score_loop(crop_ph, crop_rainfall, county_ph, county_rainfall):
+    """Reference implementation: one Python iteration per crop × county pair"""
+    scores = []
+    for (ph_low, ph_high), (rain_low, rain_high) in zip(crop_ph.tolist(), crop_rainfall.tolist()):
+        row = []
+        for ph, rain in zip(county_ph.tolist(), county_rainfall.tolist()):
+            ph_fit = _fit(ph, ph_low, ph_high, SUITABILITY_PH_TOLERANCE, SUITABILITY_PH_TOLERANCE)
+            rain_fit = _fit(rain, rain_low, rain_high, rain_low * SUITABILITY_DRY_TOLERANCE,
+                            rain_high * SUITABILITY_WET_TOLERANCE)
+            row.append((ph_fit * rain_fit) ** 0.5)
+        scores.append(row)
+    return scores
+
+
+def main(sizes=((4, 47), (100, 47), (1000, 47), (1000, 1000))):
+    """Returns {'crops x counties': {'numpy': us, 'loop': us}}"""
+    results = {}
+    for crops, counties in sizes:
+        inputs = synthetic_inputs(crops, counties)
+        assert np.allclose(score_matrix(*inputs)[2], score_loop(*inputs))
+        pairs = crops * counties
+        number = max(1, 200000 // pairs)
+        print(f"-- {crops} crops x {counties} counties ({pairs} pairs)")
+        results[f'{crops}x{counties}'] = {
+            'numpy': bench('score_matrix (numpy)', lambda: score_matrix(*inputs), number=number, repeat=3),
+            'loop': bench('score_loop (python)', lambda: score_loop(*inputs), number=max(1, number // 20), repeat=3),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -1,108 +1,17 @@
 # chatbot.py
 from flask import Flask, render_template, request, jsonify
 from datetime import datetime
+from html import escape
 import json
 import os
 
-# Local utilities and knowledge base
-from utils.gemini_advisor import RegenerativeAdvisor
-from utils.weather_service import WeatherService
-from data.kenya_agriculture import KENYA_CROPS, SOIL_TYPES, KENYAN_REGIONS
-
-app = Flask(_name_)
-advisor = RegenerativeAdvisor()
-weather_service = WeatherService()
-
-# === Knowledge Base === #
-AGRICULTURE_KNOWLEDGE = {
-    "crops": {
-        "maize": {
-            "regenerative_practices": [
-                "Practice intercropping with legumes like beans to fix nitrogen",
-                "Use cover crops during off-season to protect soil",
-                "Apply organic mulch to retain moisture and suppress weeds",
-                "Rotate with other crops every 2-3 seasons"
-            ],
-            "soil_health": [
-                "Add compost or well-decomposed manure before planting",
-                "Minimize tillage to preserve soil structure",
-                "Plant diverse cover crops to improve soil biology"
-            ],
-            "pest_management": [
-                "Use companion planting with crops like basil or marigold",
-                "Encourage beneficial insects with flowering plants",
-                "Apply neem oil or botanical extracts for natural pest control"
-            ]
-        },
-        "beans": {
-            "regenerative_practices": [
-                "Excellent nitrogen-fixing crop for soil improvement",
-                "Intercrop with maize for maximum land use efficiency",
-                "Use rhizobium inoculants to enhance nitrogen fixation",
-                "Practice crop rotation with cereals"
-            ],
-            "water_management": [
-                "Mulch heavily to reduce water evaporation",
-                "Plant during optimal rainfall periods",
-                "Use drip irrigation if available"
-            ]
-        },
-        "sorghum": {
-            "regenerative_practices": [
-                "Drought-tolerant crop excellent for climate resilience",
-                "Deep roots help break soil compaction",
-                "Leave crop residues to improve soil organic matter",
-                "Intercrop with legumes for nitrogen fixation"
-            ],
-            "climate_adaptation": [
-                "Choose drought-resistant varieties",
-                "Plant early to catch maximum rainfall",
-                "Use water harvesting techniques"
-            ]
-        },
-        "sweet_potato": {
-            "regenerative_practices": [
-                "Excellent ground cover that suppresses weeds naturally",
-                "Vines can be used as livestock feed",
-                "Plant on ridges to improve drainage",
-                "Use orange-fleshed varieties for better nutrition"
-            ],
-            "soil_improvement": [
-                "Helps prevent soil erosion with ground coverage",
-                "Improves soil structure with fibrous root system",
-                "Crop residues add organic matter to soil"
-            ]
-        }
-    },
-    "soil_types": {
-        "clay": {
-            "challenges": ["Poor drainage", "Compaction", "Slow warming"],
-            "solutions": [
-                "Add organic matter to improve structure",
-                "Create raised beds for better drainage",
-                "Avoid working when soil is too wet",
-                "Use cover crops with deep taproots"
-            ]
-        },
-        "sandy": {
-            "challenges": ["Fast drainage", "Nutrient leaching", "Low water retention"],
-            "solutions": [
-                "Add compost and organic matter regularly",
-                "Use mulching to retain moisture",
-                "Apply nutrients in smaller, frequent doses",
-                "Plant cover crops to reduce erosion"
-            ]
-        },
-        "volcanic": {
-            "advantages": ["High fertility", "Good structure", "Rich in minerals"],
-            "management": [
-                "Maintain organic matter levels",
-                "Practice minimal tillage",
-                "Use crop rotation to maintain soil health"
-            ]
-        }
-    }
-}
+# Local utilities and knowledge base (rule-based only: no Gemini SDK or weather client)
+from utils.intent_router import IntentRouter
+from utils.knowledge import get_knowledge_store
+
+app = Flask(__name__)
+knowledge = get_knowledge_store()
+intent_router = IntentRouter(knowledge)
 
 # === Routes === #
 
@@ -111,9 +20,9 @@ def home():
     """Main landing page"""
     return render_template(
         'index.html',
-        crops=list(KENYA_CROPS.keys()),
-        soil_types=list(SOIL_TYPES.keys()),
-        regions=KENYAN_REGIONS
+        crops=knowledge.crops(),
+        soil_types=knowledge.soils(),
+        regions=knowledge.featured_regions
     )
 
 @app.route('/generate-plan', methods=['POST'])
@@ -151,74 +60,40 @@ def chat():
 
 def generate_chatbot_response(question, plan_context=""):
     """Generate contextual responses for farming-related questions"""
-    q = question.lower()
-
-    if any(word in q for word in ['weather', 'rain', 'drought', 'climate']):
-        return """🌤️ **Weather & Climate Tips:**
-• Monitor forecasts & plan planting accordingly
-• Mulch heavily during dry seasons
-• Improve drainage during heavy rains
-• Use climate-smart crop varieties"""
-
-    elif any(word in q for word in ['soil', 'fertility', 'nutrients', 'compost']):
-        return """🏔️ **Soil Health Tips:**
-• Test soil pH regularly (6.0-7.0 optimal)
-• Add compost or manure regularly
-• Reduce tillage & use cover crops"""
-
-    elif any(word in q for word in ['pest', 'disease', 'insect']):
-        return """🐛 **Pest Management:**
-• Use marigolds & basil for natural pest control
-• Neem oil & organic extracts are effective
-• Rotate crops yearly to break pest cycles"""
-
-    elif any(crop in q for crop in AGRICULTURE_KNOWLEDGE['crops']):
-        crop_mentioned = next((crop for crop in AGRICULTURE_KNOWLEDGE['crops'] if crop in q), None)
-        if crop_mentioned:
-            crop_info = AGRICULTURE_KNOWLEDGE['crops'][crop_mentioned]
-            response = f"🌾 **{crop_mentioned.title()} Farming Tips:**\n"
-            for section, tips in crop_info.items():
-                response += f"\n**{section.replace('_', ' ').title()}:**\n"
-                for tip in tips:
-                    response += f"• {tip}\n"
-            return response
-
-    return """🌱 **General Regenerative Agriculture Tips:**
-• Build soil health using compost
-• Diversify crops & rotate seasons
-• Use cover crops & minimal tillage"""
+    return intent_router.route(question).answer
 
-def generate_farming_plan(location, size, crops, soil_type, experience, goals):
-    """Generate a full regenerative agriculture plan"""
-    plan = f"""
-    <h2>🌱 Your Personalized Regenerative Agriculture Plan</h2>
-    <p><strong>Location:</strong> {location} County |
-    <strong>Farm Size:</strong> {size} acres |
-    <strong>Main Crop:</strong> {crops.replace('_', ' ').title()}</p>
+def _title(value):
+    return value.replace('_', ' ').title()
 
-    <h3>🎯 Goal: {goals.replace('_', ' ').title()}</h3>
+def render_soil_section(soil_type):
+    """Soil management section of the plan for one soil type"""
+    parts = [f"""
 
-    <h3>🏔️ Soil Management for {soil_type.replace('_', ' ').title()} Soil:</h3>
-    """
+    <h3>🏔️ Soil Management for {escape(_title(soil_type))} Soil:</h3>
+    """]
 
-    if soil_type in AGRICULTURE_KNOWLEDGE['soil_types']:
-        soil_info = AGRICULTURE_KNOWLEDGE['soil_types'][soil_type]
+    soil_info = knowledge.practices_by_topic(soil=soil_type)
+    if soil_info:
         if 'challenges' in soil_info:
-            plan += "<p><strong>Challenges:</strong> " + ", ".join(soil_info['challenges']) + "</p>"
+            parts.append("<p><strong>Challenges:</strong> " + ", ".join(soil_info['challenges']) + "</p>")
         if 'solutions' in soil_info:
-            plan += "<ul>"
-            for solution in soil_info['solutions']:
-                plan += f"<li>{solution}</li>"
-            plan += "</ul>"
-
-    if crops in AGRICULTURE_KNOWLEDGE['crops']:
-        crop_info = AGRICULTURE_KNOWLEDGE['crops'][crops]
-        plan += f"<h3>🌾 {crops.replace('_', ' ').title()} Recommendations:</h3><ul>"
-        for practice in crop_info.get('regenerative_practices', []):
-            plan += f"<li>{practice}</li>"
-        plan += "</ul>"
-
-    plan += """
+            parts.append("<ul>")
+            parts.extend(f"<li>{solution}</li>" for solution in soil_info['solutions'])
+            parts.append("</ul>")
+
+    return ''.join(parts)
+
+def render_crop_section(crops):
+    """Crop recommendations section of the plan for one crop"""
+    crop_info = knowledge.practices_by_topic(crop=crops)
+    if not crop_info:
+        return ''
+    parts = [f"<h3>🌾 {_title(crops)} Recommendations:</h3><ul>"]
+    parts.extend(f"<li>{practice}</li>" for practice in crop_info.get('regenerative_practices', []))
+    parts.append("</ul>")
+    return ''.join(parts)
+
+PLAN_TIMELINE = """
     <h3>📅 Implementation Timeline:</h3>
     <h4>Month 1-2: Preparation</h4>
     <ul><li>Test soil & prepare compost</li><li>Plan crop layout</li></ul>
@@ -228,7 +103,40 @@ def generate_farming_plan(location, size, crops, soil_type, experience, goals):
     <ul><li>Check soil moisture</li><li>Manage pests organically</li></ul>
     """
 
-    return plan
+# Soil and crop sections only depend on static data, so every combination is built once at startup
+_KNOWN_SOILS = knowledge.soils()
+_KNOWN_CROPS = knowledge.crops()
+CROP_TITLES = {crop: escape(_title(crop)) for crop in _KNOWN_CROPS}
+PLAN_FRAGMENTS = {
+    (soil_type, crops): render_soil_section(soil_type) + render_crop_section(crops) + PLAN_TIMELINE
+    for soil_type in _KNOWN_SOILS
+    for crops in _KNOWN_CROPS
+}
+
+def generate_farming_plan(location, size, crops, soil_type, experience, goals):
+    """Generate a full regenerative agriculture plan"""
+    crops, soil_type, goals = str(crops), str(soil_type), str(goals)
+
+    body = PLAN_FRAGMENTS.get((soil_type, crops))
+    if body is None:
+        body = render_soil_section(soil_type) + render_crop_section(crops) + PLAN_TIMELINE
+    crop_title = CROP_TITLES.get(crops)
+    if crop_title is None:
+        crop_title = escape(_title(crops))
+
+    # Everything the user typed is escaped before it reaches the HTML
+    return ''.join((
+        "\n    <h2>🌱 Your Personalized Regenerative Agriculture Plan</h2>\n    <p><strong>Location:</strong> ",
+        escape(str(location)),
+        " County |\n    <strong>Farm Size:</strong> ",
+        escape(str(size)),
+        " acres |\n    <strong>Main Crop:</strong> ",
+        crop_title,
+        "</p>\n\n    <h3>🎯 Goal: ",
+        escape(_title(goals)),
+        "</h3>",
+        body,
+    ))
 
 def get_weather_info(location):
     """Placeholder for weather integration"""
@@ -25,41 +25,46 @@ document.addEventListener('DOMContentLoaded', function() {
         };
         
         try {
-            const response = await fetch('/generate-plan', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
+            const planContent = document.getElementById('planContent');
+            planContent.innerHTML = '';
+            // A new plan needs a new chat session
+            window.chatSessionId = null;
+
+            let received = false;
+            let planHtml = '';
+            let sectionText = '';
+            await streamPlan(formData, {
+                weather: function(weather) {
+                    showWeather(weather);
+
+                    // Show results as soon as the first event arrives
+                    loading.classList.add('hidden');
+                    results.classList.remove('hidden');
+                    results.scrollIntoView({ behavior: 'smooth' });
+                },
+                chunk: function(data) {
+                    received = true;
+                    // Cached sections arrive rendered by the server; only a section being written is formatted here
+                    if (data.html !== undefined) {
+                        planHtml += data.html;
+                    } else if (data.end) {
+                        planHtml += formatPlan(sectionText);
+                        sectionText = '';
+                    } else {
+                        sectionText += data.text;
+                    }
+                    planContent.innerHTML = `<div class="formatted-plan">${planHtml}</div>` +
+                        (sectionText ? formatPlan(sectionText) : '');
                 },
-                body: JSON.stringify(formData)
+                error: function(data) {
+                    throw new Error(data.error);
+                }
             });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                // Display weather info
-                const weather = result.weather;
-                document.getElementById('weatherDetails').innerHTML = `
-                    <div class="flex flex-wrap gap-4">
-                        <span>🌡️ ${weather.temperature}°C</span>
-                        <span>💧 ${weather.humidity}% humidity</span>
-                        <span>☁️ ${weather.description}</span>
-                    </div>
-                `;
-                
-                // Display the generated plan
-                document.getElementById('planContent').innerHTML = formatPlan(result.plan);
-                
-                // Show results
-                loading.classList.add('hidden');
-                results.classList.remove('hidden');
-                
-                // Scroll to results
-                results.scrollIntoView({ behavior: 'smooth' });
-                
-            } else {
-                throw new Error(result.error);
+
+            if (!received) {
+                throw new Error('Empty plan');
             }
-            
+
         } catch (error) {
             console.error('Error:', error);
             alert('Sorry, there was an error generating your plan. Please try again.');
@@ -72,6 +77,58 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+function showWeather(weather) {
+    document.getElementById('weatherDetails').innerHTML = `
+        <div class="flex flex-wrap gap-4">
+            <span>🌡️ ${weather.temperature}°C</span>
+            <span>💧 ${weather.humidity}% humidity</span>
+            <span>☁️ ${weather.description}</span>
+        </div>
+    `;
+}
+
+async function streamPlan(formData, handlers) {
+    // Read Server-Sent Events from a POST response and dispatch them by name
+    const response = await fetch('/generate-plan/stream?format=html', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(formData)
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error(`Plan stream failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(function(line) {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+
+            if (handlers[eventName]) {
+                handlers[eventName](JSON.parse(data));
+            }
+        }
+    }
+}
+
 function formatPlan(planText) {
     // Convert markdown-style headers to HTML
     let formatted = planText
@@ -0,0 +1,21 @@
+# tests/conftest.py
+"""Point every cache, queue and state file at a scratch directory before the app modules are imported"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix='regai-test-')
+os.environ.update({
+    'PLAN_CACHE_PATH': os.path.join(_workdir, 'plans.sqlite3'),
+    'WEATHER_SNAPSHOT_PATH': os.path.join(_workdir, 'weather_snapshot.json'),
+    'QUICK_TIPS_PATH': os.path.join(_workdir, 'quick_tips.json'),
+    'GEMINI_QUOTA_PATH': os.path.join(_workdir, 'gemini_quota.sqlite3'),
+    'PLAN_JOBS_PATH': os.path.join(_workdir, 'plan_jobs.sqlite3'),
+    'CHAT_SESSION_PATH': os.path.join(_workdir, 'chat_sessions.sqlite3'),
+    'CLIMATE_HISTORY_DIR': os.path.join(_workdir, 'climate'),
+    'WEATHER_REFRESH_ENABLED': '0',
+    'QUICK_TIPS_WARMUP': '0',
+    'GEMINI_WARMUP': '0',
+    # Set, so load_dotenv() can't bring in real keys from .env
+    'GEMINI_API_KEY': '',
+    'OPENWEATHER_API_KEY': '',
+})
@@ -0,0 +1,43 @@
+# tests/test_admission.py
+"""Gemini admission: shared token buckets with per-class reserves"""
+import pytest
+
+from utils.admission import AdmissionController, QuotaExhausted
+from utils.resilience import Deadline
+
+
+@pytest.fixture
+def controller(tmp_path):
+    # 1 request and 100 tokens per second, buckets of 10 requests and 1000 tokens
+    return AdmissionController(path=str(tmp_path / 'quota.sqlite3'), rpm=60, tpm=6000, headroom=1.0,
+                               burst_seconds=10)
+
+
+def test_bulk_leaves_the_reserve_to_interactive_calls(controller):
+    assert controller.try_acquire(300, priority='bulk')
+    assert controller.try_acquire(300, priority='bulk')
+    # ~400 tokens left: a third bulk call would dig into the 30% (300 token) bulk reserve
+    assert not controller.try_acquire(300, priority='bulk')
+
+    assert controller.try_acquire(300, priority='interactive')
+
+
+def test_bulk_wait_is_bounded_by_the_deadline(controller):
+    assert controller.try_acquire(900, priority='interactive')
+
+    with pytest.raises(QuotaExhausted):
+        controller.acquire(500, Deadline(0.2), priority='bulk')
+    assert controller.stats()['rejected'] == 1
+
+
+def test_settle_returns_overestimated_tokens(controller):
+    controller.acquire(600, priority='interactive')
+    assert controller.stats()['tokens_available'] == pytest.approx(400, abs=20)
+
+    controller.settle(600, 100)
+    assert controller.stats()['tokens_available'] == pytest.approx(900, abs=20)
+
+    # Never above the bucket size, and nothing to do without reported usage
+    controller.settle(600, 1)
+    controller.settle(600, None)
+    assert controller.stats()['tokens_available'] == 1000
@@ -0,0 +1,88 @@
+# tests/test_chat.py
+"""/chat through the Flask app, with Gemini stubbed out and state in a scratch directory"""
+import asyncio
+
+import App
+import asgi
+from utils.chat_sessions import summarize_plan
+
+PLAN = "## Soil Health\n• Add compost before the long rains\n• Keep the ground covered"
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class StubChat:
+    def __init__(self, history):
+        self.history = list(history)
+
+    def send_message(self, question):
+        self.history.append({'role': 'user', 'parts': [question]})
+        return StubResponse(f'stub reply to: {question}')
+
+
+class StubModel:
+    def start_chat(self, history=None):
+        return StubChat(history or [])
+
+    def generate_content(self, prompt):
+        return StubResponse('stub stateless reply')
+
+    async def generate_content_async(self, prompt):
+        return StubResponse('stub stateless reply')
+
+
+def setup_module(module):
+    App.advisor.model = StubModel()
+
+
+def test_session_turn_is_answered_by_gemini():
+    client = App.app.test_client()
+    created = client.post('/chat/session', json={'plan': PLAN}).get_json()
+    assert created['success']
+
+    question = 'what should my neighbour do with three goats'
+    response = client.post('/chat', json={'question': question, 'session_id': created['session_id']})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'reply': f'stub reply to: {question}', 'source': 'gemini'}
+
+
+def test_session_started_on_another_worker_is_rebuilt():
+    client = App.app.test_client()
+    session_id = client.post('/chat/session', json={'plan': PLAN}).get_json()['session_id']
+    client.post('/chat', json={'question': 'first question about goats', 'session_id': session_id})
+
+    # This worker no longer holds the session, as when another worker created it
+    App.chat_sessions.sessions.clear()
+    response = client.post('/chat', json={'question': 'second question about goats', 'session_id': session_id})
+
+    assert response.status_code == 200
+    assert response.get_json()['source'] == 'gemini'
+    history = App.chat_sessions.get(session_id).chat.history
+    assert {'role': 'user', 'parts': ['first question about goats']} in history
+
+
+def test_async_stateless_turn_is_logged_and_settled(monkeypatch):
+    logged, settled = [], []
+    monkeypatch.setattr(App.chat_sessions, 'log_stateless_turn', lambda prompt, response: logged.append(prompt))
+    monkeypatch.setattr(App.advisor.admission, 'settle', lambda tokens, used: settled.append(tokens))
+
+    status, payload = asyncio.run(asgi.chat({'question': 'what do goats eat in the dry season', 'plan': PLAN}, {}))
+
+    assert (status, payload) == (200, {'reply': 'stub stateless reply', 'source': 'gemini'})
+    assert len(logged) == 1 and 'what do goats eat' in logged[0]
+    assert len(settled) == 1
+
+
+def test_summary_keeps_every_section_of_the_fallback_plan():
+    plan = App.advisor.get_fallback_plan({'location': 'Nakuru', 'size': '2', 'crops': 'maize'})
+
+    summary = summarize_plan(plan)
+
+    for heading in ('Immediate Actions', 'Soil Building', 'Water Conservation'):
+        assert heading in summary
+    assert '- Apply compost to improve soil structure' in summary
@@ -0,0 +1,112 @@
+# tests/test_gemini_advisor.py
+"""Plan generation and streaming against a stub Gemini model"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from utils.cache import TTLCache, TieredCache
+from utils import gemini_advisor
+from utils.gemini_advisor import RegenerativeAdvisor, plan_stream_text
+from utils.plan_sections import PLAN_SECTIONS
+from utils.resilience import CircuitBreaker, Deadline, DeadlineExceeded
+from utils.weather_service import FALLBACK_WEATHER
+
+FARM = {'location': 'Nakuru', 'size': '2', 'crops': 'maize', 'soil_type': 'clay'}
+WEATHER = {'temperature': 21, 'humidity': 60}
+
+
+class StubModel:
+    """Streams '<heading>' then two bullets per section; sections named in `failing` raise"""
+
+    def __init__(self, failing=(), delay=0):
+        self.failing = set(failing)
+        self.delay = delay
+        self.calls = []
+
+    def generate_content(self, prompt, stream=False):
+        section = next(section for section in PLAN_SECTIONS if section.heading in prompt)
+        self.calls.append(section.name)
+        time.sleep(self.delay)
+        if section.name in self.failing:
+            raise RuntimeError('stub outage')
+        parts = [section.heading + '\n', f'• {section.name} first step\n', f'• {section.name} second step\n']
+        if stream:
+            return [SimpleNamespace(text=part, usage_metadata=None) for part in parts]
+        return SimpleNamespace(text=''.join(parts), usage_metadata=None)
+
+
+def make_advisor(model):
+    return RegenerativeAdvisor(plan_cache=TieredCache(TTLCache()), model=model, breaker=CircuitBreaker('test'))
+
+
+def streamed_text(advisor, weather=WEATHER):
+    return ''.join(plan_stream_text(kind, value) for kind, value in advisor.stream_farming_plan(FARM, weather))
+
+
+def test_stream_includes_cached_sections():
+    advisor = make_advisor(StubModel(failing={'water'}))
+    streamed_text(advisor)
+
+    # Every section but water is now cached; water streams from Gemini this time
+    advisor.model = model = StubModel()
+    text = streamed_text(advisor)
+
+    assert model.calls == ['water']
+    for section in PLAN_SECTIONS:
+        assert section.heading in text
+        assert f'{section.name} first step' in text
+
+
+def test_plans_for_placeholder_weather_are_not_cached():
+    advisor = make_advisor(StubModel())
+    advisor.generate_farming_plan(FARM, dict(FALLBACK_WEATHER))
+    streamed_text(advisor, dict(FALLBACK_WEATHER))
+
+    # Once OpenWeather is back, readings in the same bucket get a fresh plan
+    advisor.model = model = StubModel()
+    advisor.generate_farming_plan(FARM, {'temperature': 22, 'humidity': 65})
+    assert sorted(model.calls) == sorted(section.name for section in PLAN_SECTIONS)
+
+
+def test_timed_out_calls_never_start(monkeypatch):
+    # One pool thread, so later calls queue behind a slow one and time out before they start
+    monkeypatch.setattr(gemini_advisor, '_gemini_executor', ThreadPoolExecutor(max_workers=1))
+    advisor = make_advisor(StubModel())
+    started = []
+    release = threading.Event()
+
+    def slow_call():
+        started.append(time.monotonic())
+        release.wait(2)
+        return 'late'
+
+    def ask():
+        with pytest.raises(DeadlineExceeded):
+            advisor.call_gemini(slow_call, Deadline(0.2))
+
+    callers = [threading.Thread(target=ask) for _ in range(3)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    release.set()
+    gemini_advisor._gemini_executor.shutdown(wait=True)
+
+    assert len(started) == 1
+
+
+def test_closed_batch_drops_plans_not_yet_started():
+    model = StubModel(delay=0.05)
+    advisor = make_advisor(model)
+    profiles = [dict(FARM, location=location) for location in ('Nakuru', 'Kisumu', 'Meru', 'Embu')]
+    batch = advisor.generate_farming_plans(profiles, lambda location: WEATHER, max_workers=1)
+
+    next(batch)
+    batch.close()
+    time.sleep(0.3)
+
+    # The first plan, and at most the one already running when the client went away
+    assert len(model.calls) <= 2 * len(PLAN_SECTIONS)
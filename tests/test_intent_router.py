@@ -0,0 +1,32 @@
+# tests/test_intent_router.py
+"""Which chat questions are answered from the local tips instead of Gemini"""
+import pytest
+
+from utils.intent_router import IntentRouter
+
+
+@pytest.fixture(scope='module')
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize('question, intent', [
+    ('maize farming tips', 'crop:maize'),
+    ('how do I improve my soil', 'soil'),
+    ('tips for pest control', 'pest'),
+])
+def test_tip_requests_are_answered_locally(router, question, intent):
+    match = router.route(question)
+    assert match.intent == intent
+    assert match.confident
+
+
+@pytest.mark.parametrize('question', [
+    'why are my maize leaves turning yellow',
+    'should I sell my maize now',
+    'maize',
+    'will it rain tomorrow',
+    'how do I grow maize on soil that floods every year near the lake shore',
+])
+def test_other_questions_about_a_topic_go_to_gemini(router, question):
+    assert not router.route(question).confident
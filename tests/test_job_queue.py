@@ -0,0 +1,92 @@
+# tests/test_job_queue.py
+"""Plan job queue and worker pool, each against its own SQLite file"""
+import time
+
+from utils.job_queue import DONE, FAILED, QUEUED, JobQueue, WorkerPool
+from utils.weather_snapshot import acquire_refresh_lock
+
+PAYLOAD = {'farm_data': {'location': 'Nakuru', 'crops': 'maize'}}
+
+
+class StubProcess:
+    pid = 0
+    returncode = None
+
+    def poll(self):
+        return None
+
+    def terminate(self):
+        pass
+
+    def wait(self, timeout=None):
+        return 0
+
+
+def wait_for(condition, timeout=2.0):
+    """Poll `condition` until it holds; each call may have side effects (e.g. claim a job)"""
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_expired_lease_is_claimed_by_another_worker(tmp_path):
+    queue = JobQueue(path=str(tmp_path / 'jobs.sqlite3'), lease=0.05)
+    job, _ = queue.submit(PAYLOAD)
+    assert queue.claim('worker-a')[0] == job['id']
+    assert queue.claim('worker-b') is None
+
+    # worker-a died mid-job
+    time.sleep(0.06)
+    job_id, payload, attempt, priority = queue.claim('worker-b')
+
+    assert (job_id, payload, attempt, priority) == (job['id'], PAYLOAD, 2, 'normal')
+    queue.complete(job_id, {'plan': 'done'})
+    assert queue.get(job_id)['status'] == DONE
+
+
+def test_failed_attempts_retry_with_backoff_then_fail(tmp_path):
+    queue = JobQueue(path=str(tmp_path / 'jobs.sqlite3'), max_attempts=2, retry_delay=0.05)
+    job, _ = queue.submit(PAYLOAD)
+    queue.claim('worker')
+    queue.fail(job['id'], RuntimeError('gemini outage'))
+
+    assert queue.get(job['id'])['status'] == QUEUED
+    assert queue.claim('worker') is None
+    assert wait_for(lambda: queue.claim('worker') is not None)
+
+    queue.fail(job['id'], RuntimeError('gemini outage'))
+    failed = queue.get(job['id'])
+    assert failed['status'] == FAILED
+    assert failed['attempts'] == 2 and failed['error'] == 'gemini outage'
+
+
+def test_merged_submission_reports_the_raised_priority(tmp_path):
+    queue = JobQueue(path=str(tmp_path / 'jobs.sqlite3'))
+    first, _ = queue.submit(PAYLOAD, 'low')
+
+    job, merged = queue.submit(PAYLOAD, 'high')
+
+    assert merged and job['id'] == first['id']
+    assert job['priority'] == 'high'
+
+
+def test_pool_takes_over_when_the_owner_goes_away(tmp_path):
+    path = str(tmp_path / 'jobs.sqlite3')
+    owner = acquire_refresh_lock(path)
+    pool = WorkerPool(size=2, path=path, check_interval=0.01, lock_retry_interval=0.01)
+    spawned = []
+    pool._spawn = lambda: spawned.append(StubProcess()) or spawned[-1]
+
+    thread = pool.start()
+    try:
+        time.sleep(0.1)
+        assert spawned == []
+
+        owner.close()
+        assert wait_for(lambda: len(spawned) == 2)
+    finally:
+        pool.stop()
+        thread.join(2)
@@ -0,0 +1,13 @@
+# tests/test_plan_routes.py
+"""Request validation on the plan routes of the Flask app"""
+import pytest
+
+import App
+
+
+@pytest.mark.parametrize('path', ['/jobs/generate-plan', '/generate-plans/batch'])
+def test_non_object_body_is_rejected(path):
+    response = App.app.test_client().post(path, json=[{'location': 'Nakuru'}])
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
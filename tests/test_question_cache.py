@@ -0,0 +1,28 @@
+# tests/test_question_cache.py
+"""Near-duplicate chat questions share an answer; questions that differ in what they ask about don't"""
+import pytest
+
+from utils.question_cache import QuestionCache
+
+
+def test_reworded_question_reuses_the_answer():
+    cache = QuestionCache()
+    cache.put('what cover crops should I plant after maize on clay soil in Nakuru', 'answer')
+    assert cache.get('Which cover crops can I plant after maize on clay soils in Nakuru?') == 'answer'
+
+
+@pytest.mark.parametrize('stored, asked', [
+    ('what cover crops should I plant after maize on clay soil in Nakuru',
+     'what cover crops should I plant after maize on clay soil in Kisumu'),
+    ('when should I plant maize grown on clay soil in Nakuru county',
+     'when should I harvest maize grown on clay soil in Nakuru county'),
+    ('what cover crop should I grow after maize on clay soil this season',
+     'what cover crop should I grow after maize on clay soil next season'),
+    ('how much compost for 2 acres of maize on clay soil in Nakuru',
+     'how much compost for 5 acres of maize on clay soil in Nakuru'),
+])
+def test_different_place_action_time_or_number_misses(stored, asked):
+    cache = QuestionCache()
+    cache.put(stored, 'answer')
+    # Each pair is close enough by Jaccard alone; the differing place, action, time or number decides
+    assert cache.get(asked) is None
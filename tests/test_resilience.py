@@ -0,0 +1,76 @@
+# tests/test_resilience.py
+"""Circuit breaker half-open trials, and one plan's failures counting once"""
+import time
+
+from utils.resilience import BreakerGroup, CircuitBreaker
+
+
+def open_breaker(threshold=1):
+    breaker = CircuitBreaker('test', failure_threshold=threshold, reset_timeout=0.05)
+    for _ in range(threshold):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = open_breaker()
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_released_trial_can_be_taken_again():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    # The call was abandoned without an outcome
+    breaker.release()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+def test_group_failures_count_once():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+    group = BreakerGroup(breaker)
+    for _ in range(5):
+        assert group.allow()
+        group.record_failure()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()['consecutive_failures'] == 1
+
+
+def test_group_hands_back_the_trial_after_its_first_failure():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+    group = BreakerGroup(breaker)
+    group.record_failure()
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    # A later section of the same plan takes the trial and fails: already counted, so it's only released
+    assert group.allow()
+    group.record_failure()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,64 @@
+# tests/test_weather_snapshot.py
+"""Snapshot file written atomically, read by every worker, refreshed by one process at a time"""
+import json
+import os
+import time
+
+import pytest
+
+from utils import weather_snapshot
+from utils.weather_snapshot import WeatherSnapshot, acquire_refresh_lock, write_snapshot
+
+WEATHER = {'temperature': 21, 'humidity': 60, 'description': 'light rain', 'rainfall': 2}
+
+
+def snapshot(fetched_at):
+    return {'generated_at': fetched_at, 'cells': {'cell:0:0': {'weather': WEATHER, 'fetched_at': fetched_at}}}
+
+
+def test_write_replaces_the_file_and_leaves_no_temporary_files(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    write_snapshot(path, snapshot(1.0))
+    write_snapshot(path, snapshot(2.0))
+
+    with open(path) as f:
+        assert json.load(f)['generated_at'] == 2.0
+    assert os.listdir(tmp_path) == ['snapshot.json']
+
+
+def test_failed_write_keeps_the_previous_snapshot(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    write_snapshot(path, snapshot(1.0))
+
+    with pytest.raises(TypeError):
+        write_snapshot(path, {'cells': object()})
+
+    with open(path) as f:
+        assert json.load(f)['generated_at'] == 1.0
+    assert os.listdir(tmp_path) == ['snapshot.json']
+
+
+def test_reader_picks_up_a_new_snapshot_and_flags_old_entries(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    reader = WeatherSnapshot(path, max_age=60, check_interval=0)
+    assert reader.get('cell:0:0') is None
+
+    write_snapshot(path, snapshot(time.time() - 120))
+    assert reader.get('cell:0:0') == dict(WEATHER, stale=True)
+
+    time.sleep(0.01)  # a distinct mtime
+    write_snapshot(path, snapshot(time.time()))
+    assert reader.get('cell:0:0') == dict(WEATHER, stale=False)
+
+
+@pytest.mark.skipif(weather_snapshot.fcntl is None, reason='no cross-process lock on this platform')
+def test_refresh_lock_is_held_by_one_owner_at_a_time(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    owner = acquire_refresh_lock(path)
+    assert owner is not None
+    assert acquire_refresh_lock(path) is None
+
+    owner.close()
+    successor = acquire_refresh_lock(path)
+    assert successor is not None
+    successor.close()
@@ -0,0 +1,244 @@
+# utils/admission.py
+"""Quota-aware admission for Gemini calls, shared by every worker process on the host
+
+Two token buckets, one for requests and one for estimated tokens, refill at a
+share of the per-minute quota. Their levels live in SQLite, so all gunicorn
+workers and job workers draw from the same budget. Lower priority classes
+must leave a reserve in both buckets and may wait longer, so chat keeps
+answering while bulk generation queues behind it.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
+
+from utils import metrics
+from utils.geocoding import PROJECT_ROOT
+from utils.resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+GEMINI_QUOTA_PATH = os.getenv('GEMINI_QUOTA_PATH', os.path.join(PROJECT_ROOT, '.cache', 'gemini_quota.sqlite3'))
+GEMINI_RPM = float(os.getenv('GEMINI_RPM', 1000))
+GEMINI_TPM = float(os.getenv('GEMINI_TPM', 1000000))
+# Share of the quota handed out; the rest absorbs estimate errors and clock skew
+GEMINI_QUOTA_HEADROOM = float(os.getenv('GEMINI_QUOTA_HEADROOM', 0.85))
+# Largest burst, in seconds' worth of refill
+GEMINI_QUOTA_BURST_SECONDS = float(os.getenv('GEMINI_QUOTA_BURST_SECONDS', 10))
+# Output tokens assumed for a call until its response reports real usage
+GEMINI_OUTPUT_TOKENS_ESTIMATE = int(os.getenv('GEMINI_OUTPUT_TOKENS_ESTIMATE', 500))
+# Callers waiting for quota in one process before new ones are turned away
+GEMINI_ADMISSION_MAX_WAITING = int(os.getenv('GEMINI_ADMISSION_MAX_WAITING', 256))
+# Longest pause between retries while waiting, so freed quota is noticed quickly
+_POLL_SECONDS = 0.25
+
+# name: (share of each bucket that must remain after admission, longest wait in seconds)
+PRIORITY_CLASSES = {
+    'interactive': (0.0, 3.0),
+    'standard': (0.1, 10.0),
+    'bulk': (0.3, 60.0),
+}
+DEFAULT_PRIORITY = 'standard'
+
+# Priority class of the work being done, so calls deep inside the advisor are classed by their caller
+current_priority = contextvars.ContextVar('gemini_priority', default=DEFAULT_PRIORITY)
+
+ADMISSIONS = metrics.Counter('regai_gemini_admissions_total', 'Gemini admission decisions by priority and result')
+ADMISSION_WAIT = metrics.Histogram('regai_gemini_admission_wait_seconds', 'Time Gemini calls waited for quota',
+                                   buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+
+
+class QuotaExhausted(CircuitOpenError):
+    """No Gemini quota within the caller's wait bound; use the fallback, as for an open circuit"""
+
+
+@contextmanager
+def priority(name):
+    """Run the enclosed block's Gemini calls in priority class `name`"""
+    token = current_priority.set(name)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def estimate_tokens(prompt, output_tokens=GEMINI_OUTPUT_TOKENS_ESTIMATE):
+    # ~4 characters per token, as in chat_sessions
+    return max(1, len(prompt or '') // 4) + output_tokens
+
+
+def usage_tokens(response):
+    """Total tokens the response reports, or None when the SDK doesn't say"""
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'total_token_count', None) or None
+
+
+class AdmissionController:
+    """Request and token buckets in SQLite with per-class reserves and bounded waits"""
+
+    def __init__(self, path=GEMINI_QUOTA_PATH, rpm=GEMINI_RPM, tpm=GEMINI_TPM, headroom=GEMINI_QUOTA_HEADROOM,
+                 burst_seconds=GEMINI_QUOTA_BURST_SECONDS, max_waiting=GEMINI_ADMISSION_MAX_WAITING):
+        self.path = path
+        self.rates = {'requests': rpm * headroom / 60.0, 'tokens': tpm * headroom / 60.0}
+        self.capacity = {name: max(1.0, rate * burst_seconds) for name, rate in self.rates.items()}
+        self.max_waiting = max_waiting
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._waiting = {name: 0 for name in PRIORITY_CLASSES}
+        self._stats = {'admitted': 0, 'waited': 0, 'rejected': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " name TEXT PRIMARY KEY,"
+                " level REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            for name, capacity in self.capacity.items():
+                conn.execute("INSERT OR IGNORE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                             (name, capacity, time.time()))
+
+    def _connect(self):
+        # One connection per thread and per process, as in DiskCache
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _levels(self, conn, now):
+        """Bucket levels refilled up to `now`"""
+        levels = {}
+        for name, level, updated_at in conn.execute("SELECT name, level, updated_at FROM buckets"):
+            if name in self.rates:
+                levels[name] = min(self.capacity[name], level + max(0.0, now - updated_at) * self.rates[name])
+        return levels
+
+    def _take(self, tokens, reserve):
+        """Atomically take one request and `tokens`; returns 0 when admitted, else seconds until possible"""
+        need = {'requests': 1.0, 'tokens': float(tokens)}
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = self._levels(conn, now)
+                shortfall = {name: need[name] + reserve * self.capacity[name] - levels.get(name, 0.0)
+                             for name in need}
+                wait = max(max(0.0, short) / self.rates[name] for name, short in shortfall.items())
+                if wait == 0:
+                    levels = {name: level - need[name] for name, level in levels.items()}
+                for name, level in levels.items():
+                    conn.execute("UPDATE buckets SET level = ?, updated_at = ? WHERE name = ?", (level, now, name))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return wait
+        except sqlite3.Error as e:
+            # Fail open: losing the shared budget mustn't take Gemini down with it
+            logger.warning("Gemini admission state unavailable, admitting: %s", e)
+            return 0
+
+    def _admission(self, tokens, deadline, name):
+        """Yields seconds to sleep between attempts; returns once admitted, raises QuotaExhausted otherwise"""
+        name = name if name in PRIORITY_CLASSES else DEFAULT_PRIORITY
+        reserve, max_wait = PRIORITY_CLASSES[name]
+        # A call larger than the usable bucket could never be admitted
+        tokens = min(tokens or estimate_tokens(''), self.capacity['tokens'] * (1 - reserve))
+        limit = max_wait if deadline is None else min(max_wait, deadline.remaining())
+        start = time.monotonic()
+
+        wait = self._take(tokens, reserve)
+        if wait > 0:
+            with self._lock:
+                full = sum(self._waiting.values()) >= self.max_waiting
+                if not full:
+                    self._waiting[name] += 1
+            if full:
+                self._reject(name, 'queue_full')
+            try:
+                while wait > 0:
+                    if time.monotonic() - start + wait > limit:
+                        self._reject(name, 'timeout')
+                    yield min(wait, _POLL_SECONDS)
+                    wait = self._take(tokens, reserve)
+            finally:
+                with self._lock:
+                    self._waiting[name] -= 1
+
+        waited = time.monotonic() - start
+        ADMISSION_WAIT.observe(waited, priority=name)
+        ADMISSIONS.inc(priority=name, result='waited' if waited > 0.001 else 'admitted')
+        with self._lock:
+            self._stats['admitted'] += 1
+            if waited > 0.001:
+                self._stats['waited'] += 1
+
+    def _reject(self, name, reason):
+        ADMISSIONS.inc(priority=name, result=reason)
+        with self._lock:
+            self._stats['rejected'] += 1
+        raise QuotaExhausted(f'Gemini quota exhausted for {name} calls ({reason})')
+
+    def acquire(self, tokens=None, deadline=None, priority=None):
+        """Block until a call of ~`tokens` tokens fits the quota for its priority class
+
+        Raises QuotaExhausted when the wait would exceed the class's bound or the request deadline.
+        """
+        for pause in self._admission(tokens, deadline, priority or current_priority.get()):
+            time.sleep(pause)
+
+    async def acquire_async(self, tokens=None, deadline=None, priority=None):
+        for pause in self._admission(tokens, deadline, priority or current_priority.get()):
+            await asyncio.sleep(pause)
+
+    def try_acquire(self, tokens=None, priority=None):
+        """Admit only if quota is free right now (used for hedge requests)"""
+        reserve = PRIORITY_CLASSES.get(priority or current_priority.get(), PRIORITY_CLASSES[DEFAULT_PRIORITY])[0]
+        return self._take(min(tokens or estimate_tokens(''), self.capacity['tokens'] * (1 - reserve)), reserve) == 0
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once a response reports its real usage"""
+        if not actual or not estimated:
+            return
+        try:
+            self._connect().execute(
+                "UPDATE buckets SET level = MIN(?, level + ?) WHERE name = 'tokens'",
+                (self.capacity['tokens'], float(estimated) - float(actual))
+            )
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        with self._lock:
+            values = dict(self._stats)
+            values.update({f'waiting_{name}': count for name, count in self._waiting.items()})
+        try:
+            levels = self._levels(self._connect(), time.time())
+        except sqlite3.Error:
+            levels = {}
+        for name, level in levels.items():
+            values[f'{name}_available'] = round(level, 1)
+        return values
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Shared controller over GEMINI_QUOTA_PATH"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
@@ -0,0 +1,194 @@
+# utils/chat_sessions.py
+import asyncio
+import logging
+import os
+import re
+import threading
+import uuid
+
+from utils.cache import TTLCache, DiskCache
+from utils import metrics
+from utils.admission import get_admission_controller, estimate_tokens, usage_tokens
+from utils.geocoding import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+CHAT_SESSION_LIMIT = int(os.getenv('CHAT_SESSION_LIMIT', 1000))
+CHAT_SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', 3600))
+PLAN_SUMMARY_MAX_CHARS = int(os.getenv('PLAN_SUMMARY_MAX_CHARS', 1200))
+# Sessions live here so any worker process can pick up a conversation another one started
+CHAT_SESSION_PATH = os.getenv('CHAT_SESSION_PATH', os.path.join(PROJECT_ROOT, '.cache', 'chat_sessions.sqlite3'))
+# Question/answer pairs kept for rebuilding a conversation in another worker
+CHAT_HISTORY_TURNS = int(os.getenv('CHAT_HISTORY_TURNS', 10))
+
+PROMPT_TOKENS = metrics.Counter('regai_chat_prompt_tokens_total', 'Prompt tokens sent to Gemini for chat turns')
+CHAT_TURNS = metrics.Counter('regai_chat_turns_total', 'Chat turns by session mode')
+
+CHAT_INSTRUCTIONS = (
+    "You are a helpful chatbot for a regenerative agriculture advisor app in Kenya. Your goal is to "
+    "provide concise, friendly, and practical advice to small-scale farmers based on their questions."
+)
+
+
+def summarize_plan(plan_text, max_chars=PLAN_SUMMARY_MAX_CHARS):
+    """Compact plan summary: every section heading plus its first two points
+
+    Headings are markdown '#' lines or lines ending in ':' that aren't
+    bullets, as in the generated and fallback plans.
+    """
+    lines = []
+    points_in_section = 0
+    for raw_line in (plan_text or '').splitlines():
+        line = re.sub(r'[*_`]+', '', raw_line).strip()
+        if not line:
+            continue
+        if line.startswith('#') or (line.endswith(':') and not re.match(r'[•\-]|\d+[.)]\s', line)):
+            lines.append(line.lstrip('#').strip())
+            points_in_section = 0
+        elif points_in_section < 2:
+            lines.append('- ' + line.lstrip('•-* ').strip())
+            points_in_section += 1
+    summary = '\n'.join(lines)
+    if len(summary) > max_chars:
+        summary = summary[:max_chars].rsplit('\n', 1)[0]
+    return summary
+
+
+def seed_history(summary):
+    """Opening exchange that gives Gemini the instructions and the plan summary"""
+    return [
+        {'role': 'user', 'parts': [f"{CHAT_INSTRUCTIONS}\n\nSummary of the farmer's plan:\n{summary}"]},
+        {'role': 'model', 'parts': ["Understood. I'll answer questions about this plan."]},
+    ]
+
+
+def _prompt_tokens(response, fallback_text):
+    usage = getattr(response, 'usage_metadata', None)
+    count = getattr(usage, 'prompt_token_count', None)
+    if count:
+        return count
+    # Rough estimate when the SDK doesn't report usage: ~4 characters per token
+    return max(1, len(fallback_text) // 4)
+
+
+class ChatSession:
+    """One farmer's conversation: the plan summary plus a Gemini chat that keeps history
+
+    `history` holds the recent (question, reply) pairs and is saved to the
+    shared store after every turn. `start_chat(history)` builds the Gemini
+    chat on the first turn, so rebuilding a session costs nothing until used.
+    """
+
+    def __init__(self, session_id, summary, start_chat, history=(), turns=0, save=None):
+        self.id = session_id
+        self.summary = summary
+        self.history = [tuple(turn) for turn in history]
+        self.turns = turns
+        self._start_chat = start_chat
+        self._chat = None
+        self._save = save
+        self._lock = threading.Lock()
+        self._async_lock = None
+
+    @property
+    def chat(self):
+        if self._chat is None:
+            messages = seed_history(self.summary)
+            for question, reply in self.history:
+                messages += [{'role': 'user', 'parts': [question]}, {'role': 'model', 'parts': [reply]}]
+            self._chat = self._start_chat(messages)
+        return self._chat
+
+    def estimated_tokens(self, question):
+        """Quota charged up front for a turn, before Gemini reports the real usage"""
+        return estimate_tokens(self.summary + question)
+
+    def _log_turn(self, response, question):
+        get_admission_controller().settle(self.estimated_tokens(question), usage_tokens(response))
+        self.turns += 1
+        tokens = _prompt_tokens(response, self.summary + question)
+        PROMPT_TOKENS.inc(tokens, mode='session')
+        CHAT_TURNS.inc(mode='session')
+        logger.info("chat session=%s turn=%d prompt_tokens=%s", self.id, self.turns, tokens)
+        self.history = (self.history + [(question, response.text)])[-CHAT_HISTORY_TURNS:]
+        if self._save is not None:
+            self._save(self)
+
+    def ask(self, question):
+        # ChatSession history is not thread-safe; turns of one conversation run in order
+        with self._lock:
+            response = self.chat.send_message(question)
+            self._log_turn(response, question)
+            return response.text
+
+    async def ask_async(self, question):
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            response = await self.chat.send_message_async(question)
+            self._log_turn(response, question)
+            return response.text
+
+
+class ChatSessionStore:
+    """Chat sessions shared by every worker on the host, with live Gemini chats cached per process
+
+    The summary and recent history are kept in SQLite (idle TTL, LRU). A
+    worker whose copy is missing or behind (the last turns ran elsewhere)
+    rebuilds its Gemini chat from there, using `get_model()`.
+    """
+
+    def __init__(self, get_model=None, max_sessions=CHAT_SESSION_LIMIT, ttl=CHAT_SESSION_TTL,
+                 path=CHAT_SESSION_PATH):
+        self.get_model = get_model
+        self.sessions = TTLCache(max_entries=max_sessions, ttl=ttl)
+        try:
+            self.shared = DiskCache(path, max_entries=max_sessions * 10, ttl=ttl)
+        except Exception as e:
+            logger.warning("Shared chat sessions unavailable, keeping them per process: %s", e)
+            self.shared = None
+        self._rebuilt = 0
+
+    def _save(self, session):
+        if self.shared is not None:
+            self.shared.set(session.id, {'summary': session.summary, 'history': session.history,
+                                         'turns': session.turns})
+
+    def create(self, model, plan_text):
+        summary = summarize_plan(plan_text)
+        chat = model.start_chat(history=seed_history(summary))
+        session = ChatSession(uuid.uuid4().hex, summary, lambda history: chat, save=self._save)
+        self.sessions.set(session.id, session)
+        self._save(session)
+        logger.info("chat session=%s created plan_chars=%d summary_chars=%d",
+                    session.id, len(plan_text or ''), len(summary))
+        return session
+
+    def get(self, session_id):
+        if not session_id:
+            return None
+        session = self.sessions.get(session_id)
+        stored = self.shared.get(session_id) if self.shared is not None else None
+        if stored is not None and self.get_model is not None and (
+                session is None or session.turns != stored['turns']):
+            # Started on, or last answered by, another worker: rebuild it from the shared copy
+            get_model = self.get_model
+            session = ChatSession(session_id, stored['summary'],
+                                  lambda history: get_model().start_chat(history=history),
+                                  stored['history'], stored['turns'], save=self._save)
+            self._rebuilt += 1
+            logger.info("chat session=%s rebuilt turns=%d", session_id, session.turns)
+        if session is not None:
+            # Touch the entry so active conversations don't expire mid-chat
+            self.sessions.set(session_id, session)
+        return session
+
+    def log_stateless_turn(self, prompt, response):
+        """Token accounting for the legacy path that re-sends the whole plan"""
+        tokens = _prompt_tokens(response, prompt)
+        PROMPT_TOKENS.inc(tokens, mode='stateless')
+        CHAT_TURNS.inc(mode='stateless')
+        logger.info("chat stateless prompt_tokens=%s", tokens)
+
+    def stats(self):
+        return {'sessions': len(self.sessions), 'rebuilt': self._rebuilt}
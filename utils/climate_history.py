@@ -0,0 +1,434 @@
+# utils/climate_history.py
+"""Daily climate series per county in fixed-width binary files, memory-mapped for fast aggregates
+
+Layout: <dir>/index.json maps each county to a <slug>.f4 file and the date of
+its first row. A file is a flat little-endian float32 array with one row of
+COLUMNS per calendar day and no gaps, so row i is start + i days. Missing
+values are NaN.
+
+Load history from CSV (county,date,rainfall_mm,temperature_c[,humidity_pct]):
+    python -m utils.climate_history ingest daily.csv
+Show what /generate-plan sees for a county:
+    python -m utils.climate_history summary Nakuru
+"""
+import calendar
+import csv
+import datetime
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from utils.geocoding import PROJECT_ROOT, get_location_index
+from utils.weather_snapshot import write_snapshot
+
+logger = logging.getLogger(__name__)
+
+CLIMATE_HISTORY_DIR = os.getenv('CLIMATE_HISTORY_DIR', os.path.join(PROJECT_ROOT, '.cache', 'climate'))
+# Recent rainfall is compared with the same days in earlier years
+CLIMATE_RECENT_DAYS = int(os.getenv('CLIMATE_RECENT_DAYS', 30))
+# Share of days in a window that must have data for the window to count
+CLIMATE_MIN_COVERAGE = float(os.getenv('CLIMATE_MIN_COVERAGE', 0.8))
+
+COLUMNS = ('rainfall_mm', 'temperature_c', 'humidity_pct', 'samples')
+RAINFALL, TEMPERATURE, HUMIDITY, SAMPLES = range(len(COLUMNS))
+DTYPE = np.dtype('<f4')
+ROW_BYTES = DTYPE.itemsize * len(COLUMNS)
+INDEX_VERSION = 1
+
+# Rain over the recent window relative to normal, in percent: upper bound -> wording
+ANOMALY_BANDS = [(-40, 'well below normal'), (-15, 'below normal'), (15, 'near normal'),
+                 (40, 'above normal'), (float('inf'), 'well above normal')]
+
+
+def _slug(county):
+    return re.sub(r'[^a-z0-9]+', '_', county.lower()).strip('_')
+
+
+def _parse_date(value):
+    return value if isinstance(value, datetime.date) else datetime.date.fromisoformat(str(value).strip())
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _same_day(day, year):
+    """`day` moved to another year; 29 February becomes the 28th"""
+    try:
+        return day.replace(year=year)
+    except ValueError:
+        return day.replace(year=year, day=28)
+
+
+def _month_span(months):
+    first, last = months
+    return f'{calendar.month_abbr[first]}-{calendar.month_abbr[last]}'
+
+
+class ClimateHistory:
+    """Reads and appends per-county daily series; one writer process, any number of readers"""
+
+    def __init__(self, path=CLIMATE_HISTORY_DIR, seasons=None, check_interval=1.0):
+        self.path = path
+        self.index_path = os.path.join(path, 'index.json')
+        self.seasons = seasons if seasons is not None else self._default_seasons()
+        self.check_interval = check_interval
+        self._index = {}
+        self._index_mtime = None
+        self._checked_at = 0
+        self._maps = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def _default_seasons():
+        from utils.knowledge import get_knowledge_store
+        return get_knowledge_store().seasons
+
+    # --- Reading --- #
+
+    def _maybe_reload(self):
+        now = time.time()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.index_path).st_mtime
+            except OSError:
+                return
+            if mtime == self._index_mtime:
+                return
+            try:
+                with open(self.index_path, encoding='utf-8') as f:
+                    index = json.load(f)
+                self._index = index.get('counties', {}) if index.get('version') == INDEX_VERSION else {}
+                self._index_mtime = mtime
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read climate index %s: %s", self.index_path, e)
+
+    def _county_name(self, county):
+        location = get_location_index().lookup(county)
+        return location.county if location else None
+
+    def _load(self, county):
+        """(county name, first date, (days, COLUMNS) read-only memmap), or (name, None, None)"""
+        self._maybe_reload()
+        name = self._county_name(county)
+        entry = self._index.get(name)
+        if entry is None:
+            return name, None, None
+        file_path = os.path.join(self.path, entry['file'])
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return name, None, None
+        # The writer appends rows in place and ingestion replaces the file, so remap on either
+        key = (stat.st_ino, stat.st_size, entry['start'])
+        with self._lock:
+            cached = self._maps.get(name)
+            if cached is None or cached[0] != key:
+                rows = stat.st_size // ROW_BYTES
+                data = (np.memmap(file_path, dtype=DTYPE, mode='r', shape=(rows, len(COLUMNS)))
+                        if rows else np.empty((0, len(COLUMNS)), dtype=DTYPE))
+                cached = (key, _parse_date(entry['start']), data)
+                self._maps[name] = cached
+                self._summaries = {k: v for k, v in self._summaries.items() if k[0] != name}
+        return name, cached[1], cached[2]
+
+    def counties(self):
+        self._maybe_reload()
+        return list(self._index)
+
+    def series(self, county, start=None, end=None):
+        """(first date, (days, COLUMNS) array) for start <= date < end; (None, None) without history"""
+        _, first, data = self._load(county)
+        if data is None:
+            return None, None
+        a = 0 if start is None else max(0, (_parse_date(start) - first).days)
+        b = len(data) if end is None else min(len(data), max(a, (_parse_date(end) - first).days))
+        return first + datetime.timedelta(days=a), data[a:b]
+
+    @staticmethod
+    def _window_sums(values, first, starts, lengths):
+        """Sum of `values` over [start, start + length) for each window; NaN where coverage is too low
+
+        Uses a cumulative sum, so any number of windows costs one pass over the series.
+        """
+        valid = ~np.isnan(values)
+        totals = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0), dtype=np.float64)])
+        counts = np.concatenate([[0], np.cumsum(valid)])
+        a = np.array([(start - first).days for start in starts], dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        lo = np.clip(a, 0, len(values))
+        hi = np.clip(a + lengths, 0, len(values))
+        seen = counts[hi] - counts[lo]
+        sums = totals[hi] - totals[lo]
+        enough = seen >= np.ceil(lengths * CLIMATE_MIN_COVERAGE)
+        # Scale partly covered windows up to the full length
+        return np.where(enough, sums * lengths / np.maximum(seen, 1), np.nan)
+
+    def _season_for(self, today):
+        """(key, season) in progress today, or the next one to start"""
+        def months_until(item):
+            first, last = item[1]['months']
+            if (today.month - first) % 12 <= (last - first) % 12:
+                return 0
+            return (first - today.month) % 12
+        return min(self.seasons.items(), key=months_until) if self.seasons else (None, None)
+
+    @staticmethod
+    def _season_windows(months, years):
+        """(start date, length in days) of a season in each year"""
+        first, last = months
+        windows = []
+        for year in years:
+            start = datetime.date(year, first, 1)
+            end_year = year + (1 if last < first else 0)
+            end = datetime.date(end_year + last // 12, last % 12 + 1, 1)
+            windows.append((start, (end - start).days))
+        return windows
+
+    def summary(self, county, today=None):
+        """Seasonal rainfall normals, the last season's total and the recent anomaly, or None
+
+        Computed from local history only; cached per county and day until the series changes.
+        """
+        name, first, data = self._load(county)
+        if data is None or not len(data):
+            return None
+        today = today or datetime.date.today()
+        cache_key = (name, today)
+        cached = self._summaries.get(cache_key)
+        if cached is not None:
+            return cached
+
+        season_key, season = self._season_for(today)
+        if season is None:
+            return None
+        rainfall = np.asarray(data[:, RAINFALL], dtype=np.float64)
+        end = first + datetime.timedelta(days=len(data))
+
+        # Normal: mean total over every complete season on record
+        windows = [(start, length) for start, length in
+                   self._season_windows(season['months'], range(first.year, today.year + 1))
+                   if start >= first and start + datetime.timedelta(days=length) <= min(today, end)]
+        totals = self._window_sums(rainfall, first, [w[0] for w in windows], [w[1] for w in windows])
+        complete = ~np.isnan(totals)
+
+        # Recent: the last CLIMATE_RECENT_DAYS days against the same days in earlier years
+        recent_start = today - datetime.timedelta(days=CLIMATE_RECENT_DAYS)
+        earlier = [_same_day(recent_start, year) for year in range(first.year, today.year)]
+        recent = self._window_sums(rainfall, first, [recent_start] + earlier,
+                                   [CLIMATE_RECENT_DAYS] * (len(earlier) + 1))
+
+        temperature = np.asarray(data[:, TEMPERATURE], dtype=np.float64)
+        months = (np.datetime64(first, 'D') + np.arange(len(data))).astype('datetime64[M]').astype(int) % 12 + 1
+        first_month, last_month = season['months']
+        in_season = (months - first_month) % 12 <= (last_month - first_month) % 12
+        season_temperatures = temperature[in_season & ~np.isnan(temperature)]
+
+        result = {
+            'county': name,
+            'season': season_key,
+            'label': season.get('label', season_key),
+            'months': season['months'],
+            'years': int(complete.sum()),
+            'normal_rainfall_mm': round(float(totals[complete].mean()), 1) if complete.any() else None,
+            'last_season_rainfall_mm': round(float(totals[complete][-1]), 1) if complete.any() else None,
+            'recent_days': CLIMATE_RECENT_DAYS,
+            'recent_rainfall_mm': None if np.isnan(recent[0]) else round(float(recent[0]), 1),
+            'recent_normal_mm': None,
+            'recent_anomaly_pct': None,
+            'season_temperature_c': (round(float(season_temperatures.mean()), 1)
+                                     if len(season_temperatures) else None),
+        }
+        earlier_totals = recent[1:][~np.isnan(recent[1:])]
+        if len(earlier_totals):
+            result['recent_normal_mm'] = round(float(earlier_totals.mean()), 1)
+            if result['recent_rainfall_mm'] is not None and earlier_totals.mean() > 0:
+                result['recent_anomaly_pct'] = round(
+                    (result['recent_rainfall_mm'] / float(earlier_totals.mean()) - 1) * 100, 1)
+
+        # Only today's summaries are worth keeping
+        self._summaries = {k: v for k, v in self._summaries.items() if k[1] == today}
+        self._summaries[cache_key] = result
+        return result
+
+    def outlook(self, county, today=None):
+        """One-line, coarsely bucketed seasonal outlook for prompts, or None without enough history"""
+        summary = self.summary(county, today)
+        if not summary or summary['normal_rainfall_mm'] is None:
+            return None
+        text = (f"{summary['label']} ({_month_span(summary['months'])}) normally bring about "
+                f"{int(round(summary['normal_rainfall_mm'] / 50.0) * 50)} mm")
+        if summary['recent_anomaly_pct'] is not None:
+            band = next(label for limit, label in ANOMALY_BANDS if summary['recent_anomaly_pct'] <= limit)
+            text += f"; rain over the last {summary['recent_days']} days was {band}"
+        return text
+
+    def stats(self):
+        self._maybe_reload()
+        with self._lock:
+            days = sum(len(cached[2]) for cached in self._maps.values())
+        return {'counties': len(self._index), 'mapped_days': days}
+
+    # --- Writing --- #
+
+    def _write_index(self, counties):
+        write_snapshot(self.index_path, {'version': INDEX_VERSION, 'columns': list(COLUMNS),
+                                         'dtype': DTYPE.str, 'counties': counties})
+        self._checked_at = 0
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return index.get('counties', {}) if index.get('version') == INDEX_VERSION else {}
+
+    def ingest_rows(self, rows):
+        """Bulk-load daily rows (dicts with county, date, rainfall_mm, temperature_c, humidity_pct)
+
+        Rows overwrite existing days; each touched county file is rewritten and
+        swapped in atomically. Returns the number of rows stored.
+        """
+        by_county = {}
+        skipped = 0
+        for row in rows:
+            name = self._county_name(row.get('county'))
+            if name is None:
+                skipped += 1
+                continue
+            by_county.setdefault(name, []).append((
+                _parse_date(row['date']),
+                _float(row.get('rainfall_mm')),
+                _float(row.get('temperature_c')),
+                _float(row.get('humidity_pct')),
+            ))
+        if skipped:
+            logger.warning("Skipped %d climate rows for unknown counties", skipped)
+
+        with self._write_lock:
+            os.makedirs(self.path, exist_ok=True)
+            index = self._read_index()
+            stored = 0
+            for name, days in by_county.items():
+                _, old_first, old = self._load(name)
+                dates = [day[0] for day in days]
+                first = min(dates + ([old_first] if old is not None else []))
+                last = max(dates + ([old_first + datetime.timedelta(days=len(old) - 1)]
+                                    if old is not None and len(old) else []))
+                data = np.full(((last - first).days + 1, len(COLUMNS)), np.nan, dtype=DTYPE)
+                if old is not None and len(old):
+                    offset = (old_first - first).days
+                    data[offset:offset + len(old)] = old
+                rows_at = np.array([(day - first).days for day in dates])
+                data[rows_at, :SAMPLES] = np.array([day[1:] for day in days], dtype=DTYPE)
+                data[rows_at, SAMPLES] = 1
+
+                file_name = f'{_slug(name)}.f4'
+                fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=f'.{file_name}.')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(data.tobytes())
+                    os.replace(tmp_path, os.path.join(self.path, file_name))
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                index[name] = {'file': file_name, 'start': first.isoformat()}
+                stored += len(days)
+            self._write_index(index)
+        return stored
+
+    def ingest_csv(self, csv_path):
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            return self.ingest_rows(csv.DictReader(f))
+
+    def record(self, county, weather, when=None, interval=3600):
+        """Fold one current-conditions observation (taken at datetime `when`) into that day's row
+
+        Temperature and humidity become running daily means. OpenWeather only
+        reports the last hour's rain, so each observation adds its share for
+        `interval` seconds of that hour.
+        """
+        name = self._county_name(county)
+        if name is None or not weather:
+            return False
+        day = (when or datetime.datetime.now()).date()
+
+        with self._write_lock:
+            os.makedirs(self.path, exist_ok=True)
+            index = self._read_index()
+            entry = index.get(name)
+            if entry is None:
+                entry = index[name] = {'file': f'{_slug(name)}.f4', 'start': day.isoformat()}
+                self._write_index(index)
+            file_path = os.path.join(self.path, entry['file'])
+            row = (day - _parse_date(entry['start'])).days
+            if row < 0:
+                return False
+
+            rows = os.path.getsize(file_path) // ROW_BYTES if os.path.exists(file_path) else 0
+            if row >= rows:
+                # Append: pad any missed days with NaN, then today's empty row
+                with open(file_path, 'ab') as f:
+                    f.write(np.full((row + 1 - rows, len(COLUMNS)), np.nan, dtype=DTYPE).tobytes())
+                rows = row + 1
+
+            data = np.memmap(file_path, dtype=DTYPE, mode='r+', shape=(rows, len(COLUMNS)))
+            values = data[row]
+            samples = 0 if np.isnan(values[SAMPLES]) else int(values[SAMPLES])
+            for column, key in ((TEMPERATURE, 'temperature'), (HUMIDITY, 'humidity')):
+                observed = _float(weather.get(key))
+                if not np.isnan(observed):
+                    current = values[column]
+                    values[column] = observed if np.isnan(current) else (current * samples + observed) / (samples + 1)
+            rain = _float(weather.get('rainfall'))
+            if not np.isnan(rain):
+                share = rain * min(interval, 3600) / 3600.0
+                values[RAINFALL] = share if np.isnan(values[RAINFALL]) else values[RAINFALL] + share
+            values[SAMPLES] = samples + 1
+            data.flush()
+            del data
+        return True
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_climate_history():
+    """Shared reader over CLIMATE_HISTORY_DIR"""
+    global _history
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = ClimateHistory()
+    return _history
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    history = get_climate_history()
+    if len(sys.argv) == 3 and sys.argv[1] == 'ingest':
+        print(f"Stored {history.ingest_csv(sys.argv[2])} rows in {history.path}")
+    elif len(sys.argv) == 3 and sys.argv[1] == 'summary':
+        print(json.dumps(history.summary(sys.argv[2]), indent=2))
+        print(history.outlook(sys.argv[2]))
+    else:
+        print(__doc__)
@@ -0,0 +1,90 @@
+# utils/compression.py
+"""gzip/brotli for JSON and HTML responses, for farmers on metered mobile data
+
+Brotli is used when the `brotli` package is installed and the client asks
+for it; gzip (stdlib) otherwise. Streamed responses (SSE, JSON lines) are
+left alone so events still reach the client as they happen.
+"""
+import gzip
+import os
+
+from utils.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies gain less than the compression costs
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+COMPRESS_MIMETYPES = ('application/json', 'text/html')
+
+# Responses with an ETag (landing page, quick tips) are compressed once per version and encoding
+_compressed = TTLCache(max_entries=256, ttl=24 * 3600)
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header value"""
+    offered = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            offered[name] = quality
+    wildcard = offered.get('*', 0.0)
+    if brotli is not None and offered.get('br', wildcard) > 0:
+        return 'br'
+    if offered.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def compressible(mimetype, size):
+    return size >= COMPRESS_MIN_BYTES and (mimetype or '').split(';')[0].strip() in COMPRESS_MIMETYPES
+
+
+def init_app(app):
+    """Compress large JSON and HTML responses from the Flask app"""
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+                or 'Content-Encoding' in response.headers):
+            return response
+        body = response.get_data()
+        if not compressible(response.mimetype, len(body)):
+            return response
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        compressed = _compressed.get((etag, encoding)) if etag else None
+        if compressed is None:
+            compressed = compress(body, encoding)
+            if etag:
+                _compressed.set((etag, encoding), compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if etag and not weak:
+            # The encoded bytes differ from the identity ones, so the validator is only weakly equal
+            response.set_etag(etag, weak=True)
+        return response
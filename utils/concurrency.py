@@ -0,0 +1,65 @@
+# utils/concurrency.py
+import asyncio
+import threading
+import weakref
+
+
+class AsyncLimiter:
+    """Caps in-flight coroutines; one asyncio.Semaphore per event loop, created on first use"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    async def __aenter__(self):
+        await self._semaphore().acquire()
+        with self._lock:
+            self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore().release()
+
+
+class AsyncSingleFlight:
+    """Collapses concurrent coroutine calls with the same key into one awaited call"""
+
+    def __init__(self):
+        self._pending = weakref.WeakKeyDictionary()
+
+    async def run(self, key, factory):
+        """Returns (result, coalesced)"""
+        loop = asyncio.get_running_loop()
+        pending = self._pending.setdefault(loop, {})
+        future = pending.get(key)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = pending[key] = loop.create_future()
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved so waiter-less failures don't log warnings
+            future.exception()
+            raise
+        finally:
+            pending.pop(key, None)
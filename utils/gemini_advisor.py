@@ -1,73 +1,675 @@
 # utils/gemini_advisor.py
-import google.generativeai as genai
 import os
-from dotenv import load_dotenv
+import hashlib
 import json
+import asyncio
+import queue
+import contextvars
+from contextlib import nullcontext
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from utils.cache import TTLCache, DiskCache, TieredCache
+from utils import metrics
+from utils.concurrency import AsyncLimiter
+from utils import startup
+from utils.resilience import DeadlineExceeded, CircuitBreaker, CircuitOpenError, BreakerGroup
+from utils.admission import get_admission_controller, estimate_tokens, usage_tokens
+from utils.knowledge import get_knowledge_store
+from utils.plan_sections import (PLAN_SECTIONS, section_context, section_cache_key, build_section_prompt,
+                                 has_heading, normalize_section, local_section, assemble_plan)
+from utils.plan_render import render_plan, render_fragment
+from utils.weather_service import is_fallback_weather
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAN_CACHE_PATH = os.getenv('PLAN_CACHE_PATH', os.path.join(PROJECT_ROOT, '.cache', 'plans.sqlite3'))
+PLAN_CACHE_TTL = int(os.getenv('PLAN_CACHE_TTL', 6 * 3600))
+PLAN_CACHE_MEMORY_SIZE = int(os.getenv('PLAN_CACHE_MEMORY_SIZE', 256))
+PLAN_CACHE_DISK_SIZE = int(os.getenv('PLAN_CACHE_DISK_SIZE', 5000))
+# Rendered plan HTML, kept apart so it doesn't evict plans and sections from the plan cache
+PLAN_HTML_CACHE_SIZE = int(os.getenv('PLAN_HTML_CACHE_SIZE', 128))
+GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL_NAME', 'gemini-1.5-flash')
+PLAN_BATCH_CONCURRENCY = int(os.getenv('PLAN_BATCH_CONCURRENCY', 4))
+# Upper bound on outstanding Gemini requests from the async path, per process
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 64))
+
+# Longest a single Gemini call may run, even when the request budget allows more
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 20))
+# Longest gap allowed between streamed chunks once the first one has arrived
+GEMINI_STREAM_IDLE_TIMEOUT = float(os.getenv('GEMINI_STREAM_IDLE_TIMEOUT', 10))
+# Send a second, racing request when a hedged call is slower than this (0 disables hedging)
+GEMINI_HEDGE_AFTER = float(os.getenv('GEMINI_HEDGE_AFTER', 0))
+
+gemini_limiter = AsyncLimiter(GEMINI_MAX_CONCURRENCY)
+# Sync Gemini calls run here so callers can stop waiting; a stuck call only holds one pool thread
+_gemini_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix='gemini')
+
+# Plan sections are generated here, in parallel, up to the same per-process cap
+_section_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix='plan-section')
+
+SECTION_LOOKUPS = metrics.Counter('regai_plan_section_lookups_total', 'Plan section cache lookups by section and result')
+HEDGED_CALLS = metrics.Counter('regai_gemini_hedged_total', 'Gemini calls that were raced by a hedge request')
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def load_genai():
+    """Import and configure the Gemini SDK on first use; it dominates import time otherwise"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                from dotenv import load_dotenv
+                import google.generativeai as genai
+
+                load_dotenv()
+                genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+                _genai = genai
+    return _genai
+
+
+def _normalize_text(value):
+    return ' '.join(str(value or '').lower().replace('_', ' ').replace('-', ' ').split())
+
+
+def _bucket(value, step):
+    try:
+        return round(float(value) / step) * step
+    except (TypeError, ValueError):
+        return None
+
+
+def plan_cache_key(farm_data, weather_data):
+    """Cache key from the normalized farm profile and a coarse weather bucket"""
+    try:
+        size = round(float(farm_data.get('size')), 1)
+    except (TypeError, ValueError):
+        size = _normalize_text(farm_data.get('size'))
+    profile = {
+        'location': _normalize_text(farm_data.get('location')),
+        'size': size,
+        'crops': _normalize_text(farm_data.get('crops')),
+        'soil_type': _normalize_text(farm_data.get('soil_type')),
+        # Plans stay valid across small weather changes: 2°C / 10% buckets
+        'temperature': _bucket(weather_data.get('temperature'), 2),
+        'humidity': _bucket(weather_data.get('humidity'), 10),
+    }
+    raw = json.dumps(profile, sort_keys=True)
+    return 'plan:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def build_plan_cache():
+    """Memory LRU in front of a SQLite tier shared by all workers on the host"""
+    memory = TTLCache(max_entries=PLAN_CACHE_MEMORY_SIZE, ttl=PLAN_CACHE_TTL)
+    try:
+        disk = DiskCache(PLAN_CACHE_PATH, max_entries=PLAN_CACHE_DISK_SIZE, ttl=PLAN_CACHE_TTL)
+    except Exception:
+        disk = None
+    return TieredCache(memory, disk)
+
+
+def plan_stream_text(kind, value):
+    """The plan text carried by one stream_farming_plan event"""
+    if kind == 'text':
+        return value
+    if kind == 'end':
+        return '\n\n'
+    return value + '\n\n'
 
-load_dotenv()
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 
 class RegenerativeAdvisor:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+    def __init__(self, plan_cache=None, model=None, breaker=None, admission=None):
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.plan_cache = plan_cache if plan_cache is not None else build_plan_cache()
+        self.html_cache = TTLCache(max_entries=PLAN_HTML_CACHE_SIZE, ttl=PLAN_CACHE_TTL)
+        self.breaker = breaker if breaker is not None else CircuitBreaker('gemini')
+        # Every Gemini request passes the host-wide quota scheduler first
+        self.admission = admission if admission is not None else get_admission_controller()
+        self._section_lock = threading.Lock()
+        self._section_stats = {'hit': 0, 'miss': 0, 'fallback': 0}
+        if model is None:
+            startup.component('gemini', 'lazy')
+
+    @property
+    def model(self):
+        """The Gemini model, created on first use"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    try:
+                        self._model = load_genai().GenerativeModel(GEMINI_MODEL_NAME)
+                    except Exception:
+                        startup.component('gemini', 'error')
+                        raise
+                    startup.component('gemini', 'ready', round(time.perf_counter() - start, 4))
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        with self._model_lock:
+            self._model = model
+
+    def warm_up(self):
+        """Load the SDK in a background thread so the first request doesn't pay for it"""
+        def run():
+            try:
+                self.model
+            except Exception:
+                pass
+        threading.Thread(target=run, name='gemini-warm-up', daemon=True).start()
     
-    def generate_farming_plan(self, farm_data, weather_data):
-        """Generate comprehensive regenerative farming plan"""
-        
-        prompt = f"""
-        You are Dr. Sarah Wanjiku, a leading regenerative agriculture expert in Kenya with 15 years of experience helping smallholder farmers. Create a detailed, actionable regenerative agriculture transition plan.
-
-        FARM PROFILE:
-        📍 Location: {farm_data['location']} County, Kenya
-        📏 Farm Size: {farm_data['size']} acres
-        🌾 Current Crops: {farm_data['crops']}
-        🏔️ Soil Type: {farm_data['soil_type']}
-        🌡️ Current Weather: {weather_data.get('temperature', 'N/A')}°C, Humidity: {weather_data.get('humidity', 'N/A')}%
-        
-        REQUIREMENTS:
-        Create a practical 6-month regenerative transition plan that includes:
-
-        ## 🔄 CROP ROTATION STRATEGY
-        - Specific rotation sequence for next 2 planting seasons
-        - Timing aligned with Kenya's rainfall patterns
-        - Integration with nitrogen-fixing legumes
-
-        ## 🌱 COVER CROP RECOMMENDATIONS  
-        - 3 locally available cover crop options
-        - Planting and management schedule
-        - Expected benefits for soil health
-
-        ## 🪱 SOIL HEALTH IMPROVEMENT
-        - Composting setup using local materials
-        - Minimal tillage transition plan
-        - Natural fertilizer alternatives
-
-        ## 💧 WATER MANAGEMENT
-        - Rainwater harvesting techniques
-        - Mulching strategies
-        - Drought-resistant practices
-
-        ## 📅 6-MONTH IMPLEMENTATION TIMELINE
-        - Month-by-month action plan
-        - Priority activities for each month
-        - Expected outcomes and milestones
-
-        ## 💰 COST-EFFECTIVE SOLUTIONS
-        - Low-cost implementation options
-        - Local resource utilization
-        - Potential cost savings vs current methods
-
-        CONTEXT: Focus on techniques proven successful in East Africa. Use local plant names where possible (Swahili/English). Consider the farmer has limited capital but strong community connections.
-
-        Format with clear headers, bullet points, and practical steps a farmer can immediately implement.
+    def _admit(self, tokens, deadline, breaker):
+        """Wait for quota and return the call's timeout
+
+        Runs after breaker.allow(), so any failure here (no quota, or a
+        budget used up while waiting) hands back a half-open trial.
+        """
+        try:
+            self.admission.acquire(tokens, deadline)
+            return deadline.timeout(GEMINI_TIMEOUT) if deadline is not None else GEMINI_TIMEOUT
+        except BaseException:
+            breaker.release()
+            raise
+
+    def call_gemini(self, func, deadline=None, hedge=False, tokens=None, breaker=None):
+        """Run func() (one Gemini request) under the circuit breaker, quota and request deadline
+
+        Raises CircuitOpenError without calling Gemini while the breaker is
+        open, QuotaExhausted (a CircuitOpenError) when no quota frees up in
+        time, and DeadlineExceeded when the call outlives its budget. `tokens`
+        is the call's estimated size for the token quota. With hedge=True a
+        slow call is raced by a second identical request after
+        GEMINI_HEDGE_AFTER seconds, if quota allows; only use it for short,
+        idempotent prompts. `breaker` defaults to the advisor's own; plans
+        pass a BreakerGroup so their parallel sections count as one call.
         """
+        breaker = breaker or self.breaker
+        if deadline is not None:
+            # Fail fast on a spent budget before taking a breaker trial or quota
+            deadline.timeout()
+        if not breaker.allow():
+            raise CircuitOpenError('Gemini circuit is open')
+        timeout = self._admit(tokens, deadline, breaker)
+
+        abandoned = threading.Event()
+
+        def call():
+            # A call still queued for a pool thread is skipped once nobody waits for it
+            if abandoned.is_set() or self._gave_up(deadline):
+                raise DeadlineExceeded('Gemini call abandoned before it started')
+            return func()
+
+        start = time.monotonic()
+        pending = {_gemini_executor.submit(call)}
+        try:
+            return self._wait_gemini(pending, call, timeout, start, hedge, tokens, breaker)
+        finally:
+            abandoned.set()
+            for future in pending:
+                future.cancel()
+
+    def _gave_up(self, deadline):
+        """Whether a queued Gemini call should no longer start: budget spent or circuit opened meanwhile"""
+        return (deadline is not None and deadline.expired) or self.breaker.state == CircuitBreaker.OPEN
+
+    def _wait_gemini(self, pending, call, timeout, start, hedge, tokens, breaker):
+        """call_gemini's wait loop; `pending` is updated in place so the caller can cancel what's left"""
+        hedged = not (hedge and GEMINI_HEDGE_AFTER > 0)
+        error = None
+        while pending:
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining if hedged else min(remaining, GEMINI_HEDGE_AFTER),
+                           return_when=FIRST_COMPLETED)
+            pending -= done
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                breaker.record_success()
+                return result
+            if not hedged and pending:
+                hedged = True
+                if self.admission.try_acquire(tokens):
+                    HEDGED_CALLS.inc()
+                    pending.add(_gemini_executor.submit(call))
+
+        breaker.record_failure()
+        if error is not None and not pending:
+            raise error
+        raise DeadlineExceeded(f'Gemini call timed out after {timeout:.1f}s')
 
+    async def call_gemini_async(self, factory, deadline=None, tokens=None, breaker=None):
+        """Async call_gemini: awaits factory() under the breaker and quota, cancelling it at the deadline"""
+        breaker = breaker or self.breaker
+        if deadline is not None:
+            deadline.timeout()
+        if not breaker.allow():
+            raise CircuitOpenError('Gemini circuit is open')
         try:
+            await self.admission.acquire_async(tokens, deadline)
+            timeout = deadline.timeout(GEMINI_TIMEOUT) if deadline is not None else GEMINI_TIMEOUT
+        except BaseException:
+            breaker.release()
+            raise
+        try:
+            result = await asyncio.wait_for(factory(), timeout)
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            raise DeadlineExceeded(f'Gemini call timed out after {timeout:.1f}s')
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled by the caller: says nothing about Gemini's health
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result
+
+    def generate_text(self, prompt, deadline=None, hedge=False, breaker=None):
+        """One-shot Gemini completion for short prompts (quick tips, chat, plan sections)"""
+        tokens = estimate_tokens(prompt)
+
+        def call():
             response = self.model.generate_content(prompt)
+            self.admission.settle(tokens, usage_tokens(response))
             return response.text
+
+        with metrics.timed('llm_call'):
+            return self.call_gemini(call, deadline, hedge, tokens, breaker)
+
+    def stream_text(self, prompt, deadline=None, breaker=None):
+        """Yield streamed Gemini text under the breaker and quota; the first chunk must arrive within the deadline"""
+        breaker = breaker or self.breaker
+        if deadline is not None:
+            deadline.timeout()
+        if not breaker.allow():
+            raise CircuitOpenError('Gemini circuit is open')
+        tokens = estimate_tokens(prompt)
+        timeout = self._admit(tokens, deadline, breaker)
+
+        chunks = queue.Queue()
+        abandoned = threading.Event()
+
+        def produce():
+            try:
+                if abandoned.is_set() or self._gave_up(deadline):
+                    raise DeadlineExceeded('Gemini stream abandoned before it started')
+                response = self.model.generate_content(prompt, stream=True)
+                for chunk in response:
+                    if abandoned.is_set():
+                        return
+                    chunks.put(('chunk', chunk.text))
+                self.admission.settle(tokens, usage_tokens(response))
+                chunks.put(('done', None))
+            except Exception as e:
+                chunks.put(('error', e))
+
+        _gemini_executor.submit(produce)
+        outcome = None
+        try:
+            while True:
+                try:
+                    kind, value = chunks.get(timeout=timeout)
+                except queue.Empty:
+                    raise DeadlineExceeded(f'Gemini stream stalled for {timeout:.1f}s')
+                if kind == 'done':
+                    outcome = 'success'
+                    return
+                if kind == 'error':
+                    raise value
+                yield value
+                timeout = GEMINI_STREAM_IDLE_TIMEOUT
+        except Exception:
+            outcome = 'failure'
+            raise
+        finally:
+            abandoned.set()
+            if outcome == 'success':
+                breaker.record_success()
+            elif outcome == 'failure':
+                breaker.record_failure()
+            else:
+                # The client went away mid-stream
+                breaker.release()
+
+    def _count_section(self, section, result):
+        SECTION_LOOKUPS.inc(section=section.name, result=result)
+        with self._section_lock:
+            self._section_stats[result] += 1
+
+    def section_stats(self):
+        with self._section_lock:
+            stats = dict(self._section_stats)
+        lookups = stats['hit'] + stats['miss']
+        return {
+            'hits': stats['hit'],
+            'misses': stats['miss'],
+            'fallbacks': stats['fallback'],
+            'hit_rate': round(stats['hit'] / lookups, 4) if lookups else 0.0,
+        }
+
+    def _lookup_sections(self, farm_data, weather_data):
+        """Section context plus [(section, cache key, cached text or None)] in plan order
+
+        The key is None for placeholder weather, so sections written for it
+        aren't cached and served once OpenWeather is back.
+        """
+        cacheable = not is_fallback_weather(weather_data)
+        with metrics.timed('prompt_build'):
+            context = section_context(farm_data, weather_data)
+            sections = []
+            for section in PLAN_SECTIONS:
+                key = section_cache_key(section, context)
+                text = self.plan_cache.get(key)
+                self._count_section(section, 'hit' if text is not None else 'miss')
+                sections.append((section, key if cacheable else None, text))
+        return context, sections
+
+    def _lookup_plan(self, farm_data, weather_data):
+        """(key to cache the plan under, cached plan or None); the key is None for placeholder weather"""
+        cache_key = plan_cache_key(farm_data, weather_data)
+        cached_plan = self.plan_cache.get(cache_key)
+        if is_fallback_weather(weather_data):
+            cache_key = None
+        return cache_key, cached_plan
+
+    def _finish_section(self, section, context, key, text):
+        """Cache a generated section; returns (text, from_gemini), using the local version on failure"""
+        text = normalize_section(section, text)
+        if text:
+            if key is not None:
+                self.plan_cache.set(key, text)
+            return text, True
+        self._count_section(section, 'fallback')
+        return local_section(section, context, get_knowledge_store()), False
+
+    def _generate_section(self, section, context, key, deadline, breaker, limit=None):
+        try:
+            # `limit` caps a batch's Gemini calls, however many sections its plans fan out to
+            with limit if limit is not None else nullcontext():
+                text = self.generate_text(build_section_prompt(section, context), deadline, breaker=breaker)
+        except CircuitOpenError:
+            text = None
         except Exception as e:
+            metrics.count_error('gemini', e)
+            text = None
+        return self._finish_section(section, context, key, text)
+
+    async def _generate_section_async(self, section, context, key, deadline, breaker):
+        try:
+            text = await self.generate_text_async(build_section_prompt(section, context), deadline, breaker)
+        except CircuitOpenError:
+            text = None
+        except Exception as e:
+            metrics.count_error('gemini', e)
+            text = None
+        return self._finish_section(section, context, key, text)
+
+    def _stream_section(self, section, context, deadline, breaker, out, abandoned):
+        """Relay one section's Gemini chunks into `out` as ('chunk', text), then ('done', completed)"""
+        completed = False
+        try:
+            stream = self.stream_text(build_section_prompt(section, context), deadline, breaker)
+            try:
+                for chunk in stream:
+                    if abandoned.is_set():
+                        return
+                    out.put(('chunk', chunk))
+            finally:
+                stream.close()
+            completed = True
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            metrics.count_error('gemini', e)
+        finally:
+            out.put(('done', completed))
+
+    def _relay_section(self, section, context, key, out):
+        """Yield a streaming section's text as it arrives; returns (text, from_gemini, relayed anything)
+
+        The first chunks are held until the heading can be checked, so a
+        missing heading is added in front rather than after the fact.
+        """
+        parts, relayed = [], False
+        while True:
+            kind, value = out.get()
+            if kind == 'chunk':
+                parts.append(value)
+                if relayed:
+                    yield value
+                    continue
+                pending = ''.join(parts).lstrip()
+                if len(pending) < len(section.heading):
+                    continue
+            else:
+                pending = ''.join(parts).lstrip()
+                if relayed or not value or not pending.strip():
+                    break
+            relayed = True
+            yield ('' if has_heading(section, pending) else section.heading + '\n') + pending
+            if kind == 'done':
+                break
+
+        if value:
+            text, ok = self._finish_section(section, context, key, ''.join(parts))
+            return text, ok, relayed
+        if relayed:
+            # Cut off mid-section: what the farmer already saw stands, but isn't cached
+            self._count_section(section, 'fallback')
+            return normalize_section(section, ''.join(parts)), False, True
+        text, ok = self._finish_section(section, context, key, None)
+        return text, ok, False
+
+    def _submit_missing_sections(self, context, sections, deadline, limit=None):
+        """Start generating every uncached section at once; {section name: future}"""
+        # However many sections fail together, the breaker counts one failed plan
+        breaker = BreakerGroup(self.breaker)
+        return {
+            # copy_context keeps the request's route label on the stage metrics
+            section.name: _section_executor.submit(contextvars.copy_context().run, self._generate_section,
+                                                   section, context, key, deadline, breaker, limit)
+            for section, key, text in sections if text is None
+        }
+
+    def _assemble(self, farm_data, cache_key, sections, generated):
+        """Join sections in order; returns (plan, every section came from Gemini), caching only complete plans"""
+        texts, from_gemini = [], []
+        for section, key, text in sections:
+            ok = True
+            if text is None:
+                text, ok = generated[section.name]
+            texts.append(text)
+            from_gemini.append(ok)
+
+        if not any(from_gemini):
+            return self.fallback_plan(farm_data), False
+        plan = assemble_plan(texts)
+        if all(from_gemini) and cache_key is not None:
+            self.plan_cache.set(cache_key, plan)
+        return plan, all(from_gemini)
+
+    def generate_farming_plan(self, farm_data, weather_data, deadline=None, limit=None):
+        """Generate comprehensive regenerative farming plan
+
+        The plan is assembled from sections cached under only the inputs
+        each one depends on; missing sections are generated in parallel,
+        at most `limit` (a semaphore) Gemini calls at a time when given.
+        """
+        return self.generate_farming_plan_checked(farm_data, weather_data, deadline, limit)[0]
+
+    def generate_farming_plan_checked(self, farm_data, weather_data, deadline=None, limit=None):
+        """generate_farming_plan, returning (plan, complete); complete is False when any section fell back
+
+        For callers that can retry later rather than keep a partial or fallback plan.
+        """
+        cache_key, cached_plan = self._lookup_plan(farm_data, weather_data)
+        if cached_plan is not None:
+            return cached_plan, True
+
+        context, sections = self._lookup_sections(farm_data, weather_data)
+        futures = self._submit_missing_sections(context, sections, deadline, limit)
+        generated = {name: future.result() for name, future in futures.items()}
+        return self._assemble(farm_data, cache_key, sections, generated)
+
+    async def generate_farming_plan_async(self, farm_data, weather_data, deadline=None):
+        """Async version of generate_farming_plan for the ASGI entry point"""
+
+        cache_key, cached_plan = self._lookup_plan(farm_data, weather_data)
+        if cached_plan is not None:
+            return cached_plan
+
+        context, sections = self._lookup_sections(farm_data, weather_data)
+        missing = [(section, key) for section, key, text in sections if text is None]
+        breaker = BreakerGroup(self.breaker)
+        results = await asyncio.gather(*(
+            self._generate_section_async(section, context, key, deadline, breaker) for section, key in missing
+        ))
+        generated = {section.name: result for (section, _), result in zip(missing, results)}
+        return self._assemble(farm_data, cache_key, sections, generated)[0]
+
+    async def generate_text_async(self, prompt, deadline=None, breaker=None):
+        """Run one Gemini call without blocking the event loop, within the global concurrency cap"""
+        tokens = estimate_tokens(prompt)
+
+        async def call():
+            async with gemini_limiter:
+                response = await self.model.generate_content_async(prompt)
+                self.admission.settle(tokens, usage_tokens(response))
+                return response.text
+
+        with metrics.timed('llm_call'):
+            return await self.call_gemini_async(call, deadline, tokens, breaker)
+
+    def generate_farming_plans(self, profiles, get_weather, max_workers=PLAN_BATCH_CONCURRENCY):
+        """Generate plans for many farm profiles, yielding (index, weather, plan) as each finishes
+
+        Weather is looked up once per distinct location and identical
+        profiles share a single plan. At most max_workers Gemini calls
+        are made at the same time, across all the plans' sections.
+        """
+        weather_by_location = {}
+        groups = {}
+        for index, farm_data in enumerate(profiles):
+            location = _normalize_text(farm_data.get('location'))
+            if location not in weather_by_location:
+                weather_by_location[location] = get_weather(farm_data.get('location', ''))
+            weather_data = weather_by_location[location]
+            key = plan_cache_key(farm_data, weather_data)
+            groups.setdefault(key, (farm_data, weather_data, []))[2].append(index)
+
+        limit = threading.BoundedSemaphore(max(1, max_workers))
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        try:
+            futures = {
+                # copy_context carries the caller's Gemini priority class into the pool
+                executor.submit(contextvars.copy_context().run, self.generate_farming_plan,
+                                farm_data, weather_data, None, limit): (weather_data, indices)
+                for farm_data, weather_data, indices in groups.values()
+            }
+            for future in as_completed(futures):
+                weather_data, indices = futures[future]
+                plan = future.result()
+                for index in indices:
+                    yield index, weather_data, plan
+        finally:
+            # A client that disconnects closes the generator: plans not yet started are dropped
+            # and the response doesn't wait for the ones already running
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stream_farming_plan(self, farm_data, weather_data, deadline=None):
+        """Yield (kind, value) events in plan order as Gemini writes them
+
+        ('text', piece) is streamed text of the section being written and
+        ('end', section) closes it with the section's full text; ('section',
+        text) is a whole section (cached, local or the fallback plan) sent at
+        once. plan_stream_text() turns events back into plan text. Every
+        uncached section starts streaming at once, the earliest unfinished
+        one is relayed token by token and later ones buffer until reached.
+        """
+
+        cache_key, cached_plan = self._lookup_plan(farm_data, weather_data)
+        if cached_plan is not None:
+            yield 'section', cached_plan
+            return
+
+        context, sections = self._lookup_sections(farm_data, weather_data)
+        started = time.perf_counter()
+        abandoned = threading.Event()
+        breaker = BreakerGroup(self.breaker)
+        streams = {}
+        for section, key, text in sections:
+            if text is None:
+                streams[section.name] = queue.Queue()
+                # copy_context keeps the request's route label and priority class on the section's calls
+                _section_executor.submit(contextvars.copy_context().run, self._stream_section,
+                                         section, context, deadline, breaker, streams[section.name], abandoned)
+
+        # Local stand-ins are held back until Gemini text arrives, so a full outage still gets the fallback plan
+        held, texts, from_gemini = [], [], []
+        shown = False
+        try:
+            for section, key, text in sections:
+                ok, relayed = True, False
+                if text is None:
+                    relay = self._relay_section(section, context, key, streams[section.name])
+                    try:
+                        while True:
+                            chunk = next(relay)
+                            if not shown:
+                                shown = True
+                                metrics.observe_stage('llm_first_chunk', time.perf_counter() - started)
+                                yield from held
+                                held = []
+                            yield 'text', chunk
+                    except StopIteration as stop:
+                        text, ok, relayed = stop.value
+                texts.append(text)
+                from_gemini.append(ok)
+                # Cached or local text arrives whole
+                end = ('end', text) if relayed else ('section', text)
+                if ok and not shown:
+                    shown = True
+                    metrics.observe_stage('llm_first_chunk', time.perf_counter() - started)
+                if shown:
+                    yield from held
+                    held = []
+                    yield end
+                else:
+                    held.append(end)
+        finally:
+            abandoned.set()
+        metrics.observe_stage('llm_call', time.perf_counter() - started)
+
+        if not shown:
+            yield 'section', self.fallback_plan(farm_data)
+        elif all(from_gemini) and cache_key is not None:
+            self.plan_cache.set(cache_key, assemble_plan(texts))
+
+    def plan_html(self, plan, fragment=False):
+        """HTML for a plan (or one streamed section), rendered once per distinct text"""
+        key = (fragment, hashlib.sha256(plan.encode('utf-8')).hexdigest())
+        html = self.html_cache.get(key)
+        if html is None:
+            html = render_fragment(plan) if fragment else render_plan(plan)
+            self.html_cache.set(key, html)
+        return html
+
+    def fallback_plan(self, farm_data):
+        """Static plan used when Gemini fails, counted and timed as the fallback path"""
+        metrics.count_fallback('plan')
+        with metrics.timed('fallback'):
             return self.get_fallback_plan(farm_data)
-    
+
     def get_fallback_plan(self, farm_data):
         """Fallback plan if API fails"""
         return f"""
@@ -0,0 +1,140 @@
+# utils/geocoding.py
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KENYA_GAZETTEER_PATH = os.getenv('KENYA_GAZETTEER_PATH', os.path.join(PROJECT_ROOT, 'data', 'kenya_gazetteer.json'))
+
+# Farms inside the same grid cell share one weather lookup (0.25° is roughly 28 km)
+WEATHER_GRID_DEGREES = float(os.getenv('WEATHER_GRID_DEGREES', 0.25))
+FUZZY_MATCH_THRESHOLD = float(os.getenv('FUZZY_MATCH_THRESHOLD', 0.4))
+DEFAULT_COUNTY = 'Nairobi'
+
+# Words farmers add around a place name, in English and Swahili
+_NOISE_WORDS = {'county', 'kaunti', 'sub', 'subcounty', 'town', 'mji', 'wa', 'ya', 'la', 'jimbo', 'kenya', 'area', 'near'}
+
+Location = namedtuple('Location', ['name', 'county', 'region', 'lat', 'lon', 'cell', 'matched'])
+
+
+def normalize_place(text):
+    """Lowercase, strip accents and punctuation, and drop filler words"""
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode('ascii')
+    text = re.sub(r"['`’]", '', text.lower())
+    words = re.sub(r'[^a-z0-9]+', ' ', text).split()
+    return ' '.join(word for word in words if word not in _NOISE_WORDS)
+
+
+def _trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def grid_cell(lat, lon, size=WEATHER_GRID_DEGREES):
+    """Snap coordinates to a coarse grid; returns (cell key, cell centre lat, lon)"""
+    row = math.floor(lat / size)
+    col = math.floor(lon / size)
+    centre_lat = round((row + 0.5) * size, 4)
+    centre_lon = round((col + 0.5) * size, 4)
+    return f'cell:{row}:{col}', centre_lat, centre_lon
+
+
+class LocationIndex:
+    """Exact and trigram fuzzy lookup over Kenyan counties and sub-county towns"""
+
+    def __init__(self, counties, grid_size=WEATHER_GRID_DEGREES):
+        self.grid_size = grid_size
+        self.counties = {}
+        self._entries = []
+        self._gram_counts = []
+        self._exact = {}
+        self._trigram_index = {}
+
+        for county in counties:
+            self.counties[county['name']] = county
+            names = [county['name']] + county.get('aliases', [])
+            for name in names:
+                self._add(name, county['name'], county['region'], county['lat'], county['lon'])
+            for sub_county in county.get('sub_counties', []):
+                self._add(sub_county['name'], county['name'], county['region'],
+                          sub_county['lat'], sub_county['lon'])
+
+    def _add(self, name, county, region, lat, lon):
+        key = normalize_place(name)
+        if not key or key in self._exact:
+            return
+        cell, _, _ = grid_cell(lat, lon, self.grid_size)
+        entry_id = len(self._entries)
+        self._entries.append((key, Location(name, county, region, lat, lon, cell, True)))
+        self._exact[key] = entry_id
+        grams = _trigrams(key)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._trigram_index.setdefault(gram, []).append(entry_id)
+
+    def lookup(self, text):
+        """Resolve a place name, tolerating misspellings; None when nothing is close"""
+        key = normalize_place(text)
+        if not key:
+            return None
+        entry_id = self._exact.get(key)
+        if entry_id is not None:
+            return self._entries[entry_id][1]
+        return self._fuzzy(key)
+
+    def _fuzzy(self, key):
+        grams = _trigrams(key)
+        overlap = {}
+        for gram in grams:
+            for entry_id in self._trigram_index.get(gram, ()):
+                overlap[entry_id] = overlap.get(entry_id, 0) + 1
+
+        best_id, best_score = None, 0.0
+        for entry_id, shared in overlap.items():
+            # Dice coefficient over trigram sets
+            score = 2.0 * shared / (len(grams) + self._gram_counts[entry_id])
+            if score > best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None or best_score < FUZZY_MATCH_THRESHOLD:
+            return None
+        return self._entries[best_id][1]
+
+    def resolve(self, text):
+        """Like lookup(), but falls back to Nairobi with matched=False"""
+        location = self.lookup(text)
+        if location is None:
+            location = self.lookup(DEFAULT_COUNTY)._replace(matched=False)
+        return location
+
+    def place_words(self):
+        """Every word of every known place name, normalized"""
+        return {word for key in self._exact for word in key.split()}
+
+    def weather_point(self, location):
+        """Grid cell key and the coordinates used to fetch weather for it"""
+        return grid_cell(location.lat, location.lon, self.grid_size)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def load_location_index(path=KENYA_GAZETTEER_PATH):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return LocationIndex(data['counties'])
+
+
+def get_location_index():
+    """Shared index, built once per process from data/kenya_gazetteer.json"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_location_index()
+    return _index
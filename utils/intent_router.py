@@ -0,0 +1,132 @@
+# utils/intent_router.py
+import os
+import re
+from collections import namedtuple
+
+from utils.knowledge import get_knowledge_store
+
+# Longer questions are usually open-ended and go to Gemini
+LOCAL_ANSWER_MAX_WORDS = int(os.getenv('LOCAL_ANSWER_MAX_WORDS', 12))
+
+TOPIC_INTENTS = [
+    ('weather', ['weather', 'rain', 'rainy', 'rainfall', 'drought', 'climate'], """🌤️ **Weather & Climate Tips:**
+• Monitor forecasts & plan planting accordingly
+• Mulch heavily during dry seasons
+• Improve drainage during heavy rains
+• Use climate-smart crop varieties"""),
+    ('soil', ['soil', 'fertility', 'nutrients', 'compost'], """🏔️ **Soil Health Tips:**
+• Test soil pH regularly (6.0-7.0 optimal)
+• Add compost or manure regularly
+• Reduce tillage & use cover crops"""),
+    ('pest', ['pest', 'disease', 'insect'], """🐛 **Pest Management:**
+• Use marigolds & basil for natural pest control
+• Neem oil & organic extracts are effective
+• Rotate crops yearly to break pest cycles"""),
+]
+
+GENERAL_ANSWER = """🌱 **General Regenerative Agriculture Tips:**
+• Build soil health using compost
+• Diversify crops & rotate seasons
+• Use cover crops & minimal tillage"""
+
+# A question is answered locally only when it asks for general tips: besides the topic or crop it
+# may hold just these words, and at least one cue. "why are my maize leaves turning yellow" or
+# "should I sell my maize now" mention maize, but the canned tips don't answer them.
+TIP_REQUEST_CUES = frozenset([
+    'tip', 'tips', 'advice', 'how', 'grow', 'growing', 'farming', 'cultivate', 'cultivation', 'manage',
+    'management', 'control', 'improve', 'practices', 'guide', 'help', 'health', 'healthy', 'care',
+])
+TIP_REQUEST_FILLER = frozenset([
+    'a', 'an', 'the', 'my', 'me', 'i', 'we', 'our', 'to', 'for', 'on', 'about', 'of', 'in', 'with', 'and',
+    'some', 'any', 'give', 'tell', 'what', 'are', 'is', 'do', 'can', 'best', 'good', 'please', 'crop',
+    'crops', 'regenerative', 'organic',
+])
+
+# How many practice notes to show when a question only matches the full-text search
+SEARCH_ANSWER_LIMIT = int(os.getenv('SEARCH_ANSWER_LIMIT', 3))
+
+IntentMatch = namedtuple('IntentMatch', ['intent', 'answer', 'confident'])
+
+
+def render_crop_answer(crop, store=None):
+    """Pre-render the tips answer for one crop"""
+    store = store or get_knowledge_store()
+    title = crop.replace('_', ' ').title()
+    response = f"🌾 **{title} Farming Tips:**\n"
+    for section, tips in store.practices_by_topic(crop=crop).items():
+        response += f"\n**{section.replace('_', ' ').title()}:**\n"
+        for tip in tips:
+            response += f"• {tip}\n"
+
+    profile = store.crop(crop)
+    if profile:
+        seasons = [season['label'] for season in profile['planting_seasons']]
+        response += "\n**Growing In Kenya:**\n"
+        response += f"• Planting seasons: {', '.join(seasons)}\n"
+        response += f"• Companion crops: {', '.join(profile['companion_crops'])}\n"
+        response += f"• Cover crops: {', '.join(profile['cover_crops'])}\n"
+        response += f"• Soil pH: {profile['soil_ph']}, rainfall: {profile['rainfall_needs']}\n"
+    return response
+
+
+def render_search_answer(practices):
+    """Answer built from the practice notes that best match the question"""
+    response = "📚 **From our regenerative practice notes:**\n"
+    for practice in practices:
+        subject = practice.crop or practice.soil
+        suffix = f" ({subject.replace('_', ' ')})" if subject else ''
+        response += f"• {practice.text}{suffix}\n"
+    return response
+
+
+class IntentRouter:
+    """Answers common questions from one compiled regex instead of repeated substring scans"""
+
+    def __init__(self, store=None):
+        self.store = store or get_knowledge_store()
+        self.answers = {}
+        self.priority = {}
+        alternatives = []
+
+        for intent, keywords, answer in TOPIC_INTENTS:
+            self._register(intent, answer, alternatives, keywords)
+
+        for crop in sorted(self.store.crops()):
+            spoken = crop.replace('_', ' ')
+            keywords = {crop, spoken, spoken.replace(' ', '')}
+            self._register(f'crop:{crop}', render_crop_answer(crop, self.store), alternatives, keywords)
+
+        # Whole words plus plurals ("pests", "rains"); "pesticide" or "rainbow" must not hit
+        self.pattern = re.compile(r'\b(?:' + '|'.join(alternatives) + r')(?:e?s)?\b', re.IGNORECASE)
+
+    def _register(self, intent, answer, alternatives, keywords):
+        group = f'i{len(self.answers)}'
+        self.priority[group] = (len(self.answers), intent)
+        self.answers[intent] = answer
+        words = '|'.join(re.escape(word).replace(r'\ ', r'[\s_]+')
+                         for word in sorted(keywords, key=len, reverse=True))
+        alternatives.append(f'(?P<{group}>{words})')
+
+    def match_intents(self, question):
+        """Matched intents in priority order (topics before crops)"""
+        groups = {m.lastgroup for m in self.pattern.finditer(question or '')}
+        return [self.priority[group][1] for group in sorted(groups, key=lambda g: self.priority[g][0])]
+
+    def route(self, question):
+        """Best local answer and whether it is confident enough to skip Gemini"""
+        intents = self.match_intents(question)
+        if not intents:
+            # No keyword hit: fall back to full-text search over the practice notes
+            practices = self.store.search(question, limit=SEARCH_ANSWER_LIMIT)
+            if practices:
+                return IntentMatch('search', render_search_answer(practices), False)
+            return IntentMatch(None, GENERAL_ANSWER, False)
+        return IntentMatch(intents[0], self.answers[intents[0]], len(intents) == 1 and self.asks_for_tips(question))
+
+    def asks_for_tips(self, question):
+        """Whether the question, minus its topic or crop, is a plain request for tips"""
+        if len(question.split()) > LOCAL_ANSWER_MAX_WORDS:
+            return False
+        words = re.findall(r"[a-z']+", self.pattern.sub(' ', question.lower()))
+        return (any(word in TIP_REQUEST_CUES for word in words)
+                and all(word in TIP_REQUEST_CUES or word in TIP_REQUEST_FILLER for word in words))
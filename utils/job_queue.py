@@ -0,0 +1,357 @@
+# utils/job_queue.py
+"""Durable plan-generation jobs in SQLite, run by a pool of worker processes
+
+The web tier only enqueues and reads jobs, so slow Gemini calls no longer
+hold HTTP requests open. Run workers on their own with:
+    python -m utils.job_queue --workers 4
+"""
+import hashlib
+import json
+import logging
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from utils import metrics
+from utils.geocoding import PROJECT_ROOT
+from utils.weather_snapshot import acquire_refresh_lock
+
+logger = logging.getLogger(__name__)
+
+PLAN_JOBS_PATH = os.getenv('PLAN_JOBS_PATH', os.path.join(PROJECT_ROOT, '.cache', 'plan_jobs.sqlite3'))
+# Worker processes started by the web app (0 when workers run separately)
+PLAN_JOB_WORKERS = int(os.getenv('PLAN_JOB_WORKERS', 2))
+PLAN_JOB_MAX_ATTEMPTS = int(os.getenv('PLAN_JOB_MAX_ATTEMPTS', 3))
+# A running job whose worker hasn't finished within this long is handed to another worker
+PLAN_JOB_LEASE = float(os.getenv('PLAN_JOB_LEASE', 180))
+# Time budget for one attempt; jobs aren't tied to an HTTP timeout so this is generous
+PLAN_JOB_DEADLINE = float(os.getenv('PLAN_JOB_DEADLINE', 120))
+PLAN_JOB_RETRY_DELAY = float(os.getenv('PLAN_JOB_RETRY_DELAY', 5))
+# Finished jobs are kept this long for clients to collect
+PLAN_JOB_RESULT_TTL = int(os.getenv('PLAN_JOB_RESULT_TTL', 24 * 3600))
+PLAN_JOB_POLL_INTERVAL = float(os.getenv('PLAN_JOB_POLL_INTERVAL', 0.5))
+# How often a web process without the pool lock checks whether it can take the pool over
+PLAN_JOB_LOCK_RETRY = float(os.getenv('PLAN_JOB_LOCK_RETRY', 10))
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+# Gemini quota class for each job priority; queued jobs never outrank interactive chat
+ADMISSION_CLASSES = {'high': 'standard', 'normal': 'bulk', 'low': 'bulk'}
+
+JOBS = metrics.Counter('regai_plan_jobs_total', 'Plan jobs by outcome (submitted, merged, done, retried, failed)')
+
+
+def _priority_name(value):
+    return next((name for name, number in PRIORITIES.items() if number == value), 'normal')
+
+
+def job_key(payload):
+    """Identical payloads share a key, so a duplicate submission joins the job already in flight"""
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class JobQueue:
+    """SQLite-backed priority queue with leases, retries and de-duplication of in-flight jobs"""
+
+    def __init__(self, path=PLAN_JOBS_PATH, max_attempts=PLAN_JOB_MAX_ATTEMPTS, lease=PLAN_JOB_LEASE,
+                 retry_delay=PLAN_JOB_RETRY_DELAY, result_ttl=PLAN_JOB_RESULT_TTL):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.retry_delay = retry_delay
+        self.result_ttl = result_ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " job_key TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " priority INTEGER NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " result TEXT,"
+                " error TEXT,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL,"
+                " available_at REAL NOT NULL,"
+                " started_at REAL,"
+                " finished_at REAL,"
+                " lease_expires REAL,"
+                " worker TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(status, priority, available_at)")
+            # At most one queued or running job per key; later duplicates merge into it
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS jobs_in_flight ON jobs(job_key)"
+                         " WHERE status IN ('queued', 'running')")
+
+    def _connect(self):
+        # One connection per thread and per process, as in DiskCache
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        job = {key: row[key] for key in ('id', 'status', 'attempts', 'created_at', 'started_at', 'finished_at', 'error')}
+        job['priority'] = _priority_name(row['priority'])
+        job['result'] = json.loads(row['result']) if row['result'] else None
+        return job
+
+    def submit(self, payload, priority='normal'):
+        """Queue a job; returns (job, merged) where merged means an identical job was already in flight"""
+        key = job_key(payload)
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE job_key = ? AND status IN (?, ?)",
+                               (key, QUEUED, RUNNING)).fetchone()
+            if row is not None:
+                # A more urgent duplicate raises the priority of the job it joins
+                conn.execute("UPDATE jobs SET priority = MIN(priority, ?) WHERE id = ?",
+                             (PRIORITIES.get(priority, PRIORITIES['normal']), row['id']))
+                row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row['id'],)).fetchone()
+                conn.execute("COMMIT")
+                JOBS.inc(result='merged')
+                return self._row(row), True
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, job_key, status, priority, payload, created_at, available_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, key, QUEUED, PRIORITIES.get(priority, PRIORITIES['normal']), json.dumps(payload), now, now)
+            )
+            conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                         (DONE, FAILED, now - self.result_ttl))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        JOBS.inc(result='submitted')
+        return self.get(job_id), False
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def claim(self, worker):
+        """Lease the most urgent ready job to `worker`; returns (job id, payload, attempt, priority) or None
+
+        Running jobs whose lease has expired (their worker died) are claimable again.
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, payload, attempts, priority FROM jobs"
+                " WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires < ?)"
+                " ORDER BY priority, created_at LIMIT 1",
+                (QUEUED, now, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_expires = ?, worker = ?"
+                " WHERE id = ?",
+                (RUNNING, now, now + self.lease, worker, row['id'])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row['id'], json.loads(row['payload']), row['attempts'] + 1, _priority_name(row['priority'])
+
+    def complete(self, job_id, result):
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, lease_expires = NULL"
+            " WHERE id = ?",
+            (DONE, json.dumps(result), time.time(), job_id)
+        )
+        JOBS.inc(result='done')
+
+    def fail(self, job_id, error):
+        """Re-queue with exponential backoff, or mark failed once attempts run out"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        if row['attempts'] < self.max_attempts:
+            delay = self.retry_delay * 2 ** (row['attempts'] - 1)
+            conn.execute("UPDATE jobs SET status = ?, error = ?, available_at = ?, lease_expires = NULL"
+                         " WHERE id = ?", (QUEUED, str(error), now + delay, job_id))
+            JOBS.inc(result='retried')
+        else:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires = NULL"
+                         " WHERE id = ?", (FAILED, str(error), now, job_id))
+            JOBS.inc(result='failed')
+
+    def stats(self):
+        try:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        except sqlite3.Error:
+            rows = []
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+class IncompletePlan(RuntimeError):
+    """Gemini didn't write every section; the job is retried rather than finished with fallbacks"""
+
+
+def run_plan_job(payload, advisor, weather_service, priority='normal', final=True):
+    """The work behind one /jobs/generate-plan submission
+
+    Unless this is the job's last attempt, a plan with fallback sections
+    raises IncompletePlan so the queue retries it with backoff. Sections
+    Gemini did write are cached, so a retry only asks for the missing ones.
+    """
+    from utils import admission
+    from utils.climate_history import get_climate_history
+    from utils.resilience import Deadline
+
+    farm_data = payload['farm_data']
+    deadline = Deadline(PLAN_JOB_DEADLINE)
+    weather_data = weather_service.get_location_weather(farm_data['location'], deadline)
+    with admission.priority(ADMISSION_CLASSES.get(priority, 'bulk')):
+        plan, complete = advisor.generate_farming_plan_checked(farm_data, weather_data, deadline)
+    if not complete and not final:
+        raise IncompletePlan('Gemini did not write every plan section')
+    return {
+        'plan': plan,
+        'complete': complete,
+        'weather': weather_data,
+        'climate': get_climate_history().summary(farm_data['location']),
+        'farm_info': farm_data,
+    }
+
+
+def run_worker(queue=None, poll_interval=PLAN_JOB_POLL_INTERVAL, stop=None):
+    """Claim and run jobs until `stop` is set; each worker process has its own advisor and weather client"""
+    from utils.gemini_advisor import RegenerativeAdvisor
+    from utils.weather_service import WeatherService
+
+    queue = queue or JobQueue()
+    stop = stop or threading.Event()
+    advisor = RegenerativeAdvisor()
+    weather_service = WeatherService()
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    parent = int(os.getenv('PLAN_JOB_PARENT_PID', 0))
+    logger.info("Plan worker %s started", worker)
+    metrics.current_route.set('plan_job')
+    while not stop.is_set():
+        if parent and os.getppid() != parent:
+            logger.info("Plan worker %s: pool process exited, stopping", worker)
+            break
+        claimed = queue.claim(worker)
+        if claimed is None:
+            stop.wait(poll_interval)
+            continue
+        job_id, payload, attempt, priority = claimed
+        try:
+            with metrics.timed('plan_job'):
+                result = run_plan_job(payload, advisor, weather_service, priority,
+                                      final=attempt >= queue.max_attempts)
+        except Exception as e:
+            logger.warning("Plan job %s attempt %d failed: %s", job_id, attempt, e)
+            if not isinstance(e, IncompletePlan):
+                metrics.count_error('plan_job', e)
+            queue.fail(job_id, e)
+        else:
+            queue.complete(job_id, result)
+
+
+class WorkerPool:
+    """Keeps `size` worker processes running, restarting any that exit; one pool per host"""
+
+    def __init__(self, size=PLAN_JOB_WORKERS, path=PLAN_JOBS_PATH, check_interval=2.0,
+                 lock_retry_interval=PLAN_JOB_LOCK_RETRY):
+        self.size = size
+        self.path = path
+        self.check_interval = check_interval
+        self.lock_retry_interval = lock_retry_interval
+        self._processes = []
+        self._stop = threading.Event()
+        self._lock_file = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _spawn(self):
+        # A fresh interpreter rather than a fork: the web process has threads and open pools
+        # Workers stop by themselves if this process goes away
+        env = dict(os.environ, PLAN_JOBS_PATH=self.path, PLAN_JOB_PARENT_PID=str(os.getpid()))
+        return subprocess.Popen([sys.executable, '-m', 'utils.job_queue', '--worker'], cwd=PROJECT_ROOT, env=env)
+
+    def run(self):
+        self._lock_file = acquire_refresh_lock(self.path)
+        if self._lock_file is None:
+            logger.info("Another process runs the plan workers")
+        # Keep trying: when the owner is recycled or exits, this process takes the pool over
+        while self._lock_file is None:
+            if self._stop.wait(self.lock_retry_interval):
+                return
+            self._lock_file = acquire_refresh_lock(self.path)
+            if self._lock_file is not None:
+                logger.info("Took over the plan workers")
+        self._processes = [self._spawn() for _ in range(self.size)]
+        while not self._stop.wait(self.check_interval):
+            for i, process in enumerate(self._processes):
+                if process.poll() is not None:
+                    logger.warning("Plan worker %s exited with %s; restarting", process.pid, process.returncode)
+                    self._processes[i] = self._spawn()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.wait(timeout=10)
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name='plan-worker-pool', daemon=True)
+        thread.start()
+        return thread
+
+    def ensure_started(self):
+        """Start the pool on first use, so importing the app never spawns processes"""
+        if self._thread is None and self.size > 0:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = self.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if '--worker' in sys.argv:
+        stop_event = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+        try:
+            run_worker(stop=stop_event)
+        except KeyboardInterrupt:
+            pass
+    else:
+        workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else PLAN_JOB_WORKERS
+        pool = WorkerPool(size=workers)
+        signal.signal(signal.SIGTERM, lambda *_: pool.stop())
+        try:
+            pool.run()
+        except KeyboardInterrupt:
+            pool.stop()
@@ -0,0 +1,243 @@
+# utils/knowledge.py
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import namedtuple
+
+from utils.geocoding import PROJECT_ROOT, get_location_index, normalize_place
+
+KENYA_KNOWLEDGE_PATH = os.getenv('KENYA_KNOWLEDGE_PATH', os.path.join(PROJECT_ROOT, 'data', 'kenya_knowledge.json'))
+
+_STOP_WORDS = {'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'for', 'from', 'how', 'i', 'in',
+               'is', 'it', 'my', 'of', 'on', 'or', 'should', 'the', 'to', 'what', 'when', 'with', 'you'}
+
+# One searchable line of advice; crop or soil is None when it isn't specific to one
+Practice = namedtuple('Practice', ['id', 'crop', 'soil', 'topic', 'text'])
+
+
+def tokenize(text):
+    """Lowercase search terms with stop words removed and plurals folded"""
+    terms = []
+    for word in re.findall(r'[a-z0-9]+', str(text or '').lower()):
+        if word in _STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def parse_range(text):
+    """(low, high) floats from free text such as '6.0-7.5' or '500-1200mm annually'; None if no number"""
+    numbers = [float(n) for n in re.findall(r'\d+(?:\.\d+)?', str(text or ''))]
+    if not numbers:
+        return None
+    return min(numbers[:2]), max(numbers[:2])
+
+
+def _key(name):
+    return str(name or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+class KnowledgeStore:
+    """Immutable in-memory index over crops, soils, counties, seasons and practices
+
+    Every lookup is a dict access or an inverted-index walk, so cost depends
+    on the size of the answer rather than the size of the dataset.
+    """
+
+    def __init__(self, data, counties):
+        self.version = data.get('version')
+        self.seasons = data.get('seasons', {})
+        self.featured_regions = data.get('featured_regions', {})
+        self._crops = data.get('crops', {})
+        self._crop_ranges = {}
+        self._soils = data.get('soils', {})
+        self._counties = {}
+        self._county_profiles = {normalize_place(name): profile
+                                 for name, profile in data.get('county_profiles', {}).items()}
+        self._regions = {}
+        self._by_month = {month: [] for month in range(1, 13)}
+        self._by_companion = {}
+        self._by_cover = {}
+        self._practices = []
+        self._by_crop = {}
+        self._by_soil = {}
+        self._postings = {}
+
+        for county in counties.values():
+            self._counties[normalize_place(county['name'])] = county
+            self._regions.setdefault(county['region'], []).append(county['name'])
+
+        for crop, profile in self._crops.items():
+            self._crop_ranges[crop] = self._parse_ranges(profile)
+            for season in profile.get('planting_seasons', []):
+                for month in self._months(season['months']):
+                    if crop not in self._by_month[month]:
+                        self._by_month[month].append(crop)
+            for companion in profile.get('companion_crops', []):
+                self._by_companion.setdefault(_key(companion), []).append(crop)
+            for cover in profile.get('cover_crops', []):
+                self._by_cover.setdefault(_key(cover), []).append(crop)
+            for topic, lines in profile.get('practices', {}).items():
+                for text in lines:
+                    self._add_practice(crop, None, topic, text)
+
+        for soil, profile in self._soils.items():
+            for topic, lines in profile.get('practices', {}).items():
+                for text in lines:
+                    self._add_practice(None, soil, topic, text)
+
+        total = max(1, len(self._practices))
+        self._idf = {term: math.log(1 + total / len(ids)) for term, ids in self._postings.items()}
+
+    @staticmethod
+    def _months(window):
+        """Months covered by a [first, last] window, wrapping past December"""
+        first, last = window
+        return [(first - 1 + i) % 12 + 1 for i in range((last - first) % 12 + 1)]
+
+    def _parse_ranges(self, profile):
+        """Numeric soil pH and annual rainfall ranges; per-season rainfall counts every rainy season"""
+        rainfall = parse_range(profile.get('rainfall_needs'))
+        if rainfall and 'season' in str(profile.get('rainfall_needs')).lower():
+            seasons = max(1, len(self.seasons))
+            rainfall = (rainfall[0] * seasons, rainfall[1] * seasons)
+        return {'soil_ph': parse_range(profile.get('soil_ph')), 'rainfall_mm': rainfall}
+
+    def _add_practice(self, crop, soil, topic, text):
+        practice = Practice(len(self._practices), crop, soil, topic, text)
+        self._practices.append(practice)
+        if crop:
+            self._by_crop.setdefault(crop, []).append(practice.id)
+        if soil:
+            self._by_soil.setdefault(soil, []).append(practice.id)
+        for term in set(tokenize(f"{text} {topic.replace('_', ' ')} {crop or ''} {soil or ''}")):
+            self._postings.setdefault(term, []).append(practice.id)
+
+    # --- Crops and soils --- #
+
+    def crops(self):
+        return list(self._crops)
+
+    def crop(self, name):
+        """Crop profile (seasons, companions, cover crops, pH, rainfall, practices) or None"""
+        return self._crops.get(_key(name))
+
+    def crop_ranges(self, name):
+        """{'soil_ph': (low, high), 'rainfall_mm': (low, high)} parsed from the crop profile, or None"""
+        return self._crop_ranges.get(_key(name))
+
+    def soils(self):
+        return list(self._soils)
+
+    def soil(self, name):
+        """Soil profile (description and practices by topic) or None"""
+        return self._soils.get(_key(name))
+
+    def soil_descriptions(self):
+        return {name: profile.get('description', '') for name, profile in self._soils.items()}
+
+    # --- Counties --- #
+
+    def county(self, name):
+        """Gazetteer entry for a county (name, region, coordinates), tolerating 'X County'"""
+        return self._counties.get(normalize_place(name))
+
+    def county_profile(self, name):
+        """Typical annual rainfall (mm), topsoil pH and dominant soil type for a county, or None"""
+        return self._county_profiles.get(normalize_place(name))
+
+    def county_profiles(self):
+        """{county name: profile} for every county with climate and soil data"""
+        return {county['name']: self._county_profiles[key]
+                for key, county in self._counties.items() if key in self._county_profiles}
+
+    def counties_in_region(self, region):
+        return list(self._regions.get(_key(region), []))
+
+    # --- Seasons, companions and cover crops --- #
+
+    def crops_for_month(self, month):
+        """Crops with a planting window that includes this month (1-12)"""
+        return list(self._by_month.get(int(month), []))
+
+    def crops_for_season(self, season):
+        """Crops planted in a named season such as 'long_rains' or 'short rains'"""
+        window = self.seasons.get(_key(season))
+        if window is None:
+            return []
+        crops = []
+        for month in self._months(window['months']):
+            crops.extend(crop for crop in self._by_month[month] if crop not in crops)
+        return crops
+
+    def companions_of(self, crop):
+        profile = self.crop(crop)
+        return list(profile.get('companion_crops', [])) if profile else []
+
+    def crops_with_companion(self, companion):
+        """Crops that list `companion` as a companion crop"""
+        return list(self._by_companion.get(_key(companion), []))
+
+    def crops_with_cover(self, cover):
+        """Crops that list `cover` as a cover crop"""
+        return list(self._by_cover.get(_key(cover), []))
+
+    # --- Practices --- #
+
+    def practices(self, crop=None, soil=None, topic=None):
+        """Practices for a crop and/or soil (all when neither is given), optionally one topic"""
+        if crop is None and soil is None:
+            ids = range(len(self._practices))
+        else:
+            ids = self._by_crop.get(_key(crop), []) + self._by_soil.get(_key(soil), [])
+        return [self._practices[i] for i in ids if topic is None or self._practices[i].topic == topic]
+
+    def practices_by_topic(self, crop=None, soil=None):
+        """{topic: [text, ...]} for one crop or soil, in source order"""
+        grouped = {}
+        for practice in self.practices(crop=crop, soil=soil):
+            grouped.setdefault(practice.topic, []).append(practice.text)
+        return grouped
+
+    def search(self, query, limit=5, crop=None, soil=None):
+        """Full-text search over practices ranked by summed term IDF"""
+        scores = {}
+        for term in set(tokenize(query)):
+            weight = self._idf.get(term)
+            if weight is None:
+                continue
+            for practice_id in self._postings[term]:
+                scores[practice_id] = scores.get(practice_id, 0.0) + weight
+
+        candidates = scores
+        if crop is not None or soil is not None:
+            candidates = [practice_id for practice_id in scores
+                          if (crop is None or self._practices[practice_id].crop == _key(crop))
+                          and (soil is None or self._practices[practice_id].soil == _key(soil))]
+        best = heapq.nsmallest(limit, candidates, key=lambda practice_id: (-scores[practice_id], practice_id))
+        return [self._practices[practice_id] for practice_id in best]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def load_knowledge_store(path=KENYA_KNOWLEDGE_PATH):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return KnowledgeStore(data, get_location_index().counties)
+
+
+def get_knowledge_store():
+    """Shared store, built once per process from data/kenya_knowledge.json"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = load_knowledge_store()
+    return _store
@@ -0,0 +1,152 @@
+# utils/metrics.py
+"""Request and per-stage latency metrics, exposed in Prometheus text format"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+
+# Route of the request being handled, so stages timed deep inside services get labelled
+current_route = contextvars.ContextVar('current_route', default='background')
+
+
+# Every Counter and Histogram registers itself here so /metrics renders it
+REGISTRY = []
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['counts']):
+                    lines.append(f'{self.name}_bucket{_format_labels(key + (("le", bound),))} {count}')
+                lines.append(f'{self.name}_bucket{_format_labels(key + (("le", "+Inf"),))} {series["count"]}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {series["count"]}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram('regai_request_seconds', 'HTTP request latency by route')
+STAGE_SECONDS = Histogram('regai_stage_seconds', 'Latency of work stages inside a request')
+ERRORS = Counter('regai_errors_total', 'Errors by component and exception type')
+FALLBACKS = Counter('regai_fallbacks_total', 'Responses served from a local fallback instead of Gemini')
+
+_collectors = []
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, route=current_route.get(), stage=stage)
+
+
+@contextmanager
+def timed(stage):
+    """Record how long the enclosed block takes as a stage of the current route"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def count_error(component, error):
+    ERRORS.inc(component=component, type=type(error).__name__)
+
+
+def count_fallback(kind):
+    FALLBACKS.inc(route=current_route.get(), kind=kind)
+
+
+def register_stats(prefix, stats_func):
+    """Expose a component's stats() dict as gauges, e.g. cache hit/miss counters"""
+    _collectors.append((prefix, stats_func))
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for prefix, stats_func in _collectors:
+        for key, value in sorted(stats_func().items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = f'{prefix}_{key}'
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Time every Flask request and publish the results on /metrics"""
+    from flask import Response, request, g
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        current_route.set(request.url_rule.rule if request.url_rule else 'unmatched')
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                route=current_route.get(), method=request.method, status=response.status_code
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,34 @@
+# utils/plan_render.py
+"""Plan markdown to HTML, done once on the server instead of on every phone
+
+Mirrors formatPlan in static/js/main.js (same tags and classes), but
+escapes the plan text first and matches headings at the start of a line,
+so '### ' is no longer caught by the '## ' rule.
+"""
+import html
+import re
+
+# Applied in order; bullets come before emphasis so '* item' lists aren't read as italics
+_RULES = (
+    (re.compile(r'^[ \t]*### (.*)$', re.M), r'<h3 class="text-lg font-semibold text-green-600 mt-4 mb-2">\1</h3>'),
+    (re.compile(r'^[ \t]*## (.*)$', re.M), r'<h2 class="text-xl font-bold text-green-700 mt-6 mb-3">\1</h2>'),
+    (re.compile(r'^[ \t]*# (.*)$', re.M), r'<h2 class="text-xl font-bold text-green-700 mt-6 mb-3">\1</h2>'),
+    (re.compile(r'^[ \t]*[•*-] (.*)$', re.M), r'<li class="ml-4">\1</li>'),
+    (re.compile(r'\*\*(.*?)\*\*'), r'<strong>\1</strong>'),
+    (re.compile(r'\*(.*?)\*'), r'<em>\1</em>'),
+)
+_BLANK_LINES = re.compile(r'\n[ \t]*\n')
+
+
+def render_fragment(text):
+    """HTML for part of a plan, e.g. one streamed section, without the outer wrapper"""
+    formatted = html.escape((text or '').strip('\n'), quote=False)
+    for pattern, replacement in _RULES:
+        formatted = pattern.sub(replacement, formatted)
+    formatted = _BLANK_LINES.sub('</p><p class="mb-3">', formatted)
+    return formatted.replace('\n', '<br>')
+
+
+def render_plan(text):
+    """Whole plan as HTML, wrapped as formatPlan does"""
+    return f'<div class="formatted-plan">{render_fragment(text)}</div>'
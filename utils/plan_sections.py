@@ -0,0 +1,179 @@
+# utils/plan_sections.py
+"""The regenerative plan as independent sections, each cached under only the inputs it depends on"""
+import hashlib
+import json
+from collections import namedtuple
+
+from utils.climate_history import get_climate_history
+from utils.geocoding import get_location_index
+from utils.suitability import get_suitability_matrix
+
+SECTION_CACHE_VERSION = 1
+
+# key_fields: the parts of the profile a section's prompt sees, and therefore its cache key
+PlanSection = namedtuple('PlanSection', ['name', 'heading', 'points', 'key_fields'])
+
+PLAN_SECTIONS = [
+    PlanSection('rotation', '## 🔄 CROP ROTATION STRATEGY', [
+        'Specific rotation sequence for next 2 planting seasons',
+        "Timing aligned with Kenya's rainfall patterns",
+        'Integration with nitrogen-fixing legumes',
+        "Which of the county's best-suited crops belong in the rotation",
+    ], ('crops', 'region', 'suited_crops')),
+    PlanSection('cover_crops', '## 🌱 COVER CROP RECOMMENDATIONS', [
+        '3 locally available cover crop options',
+        'Planting and management schedule',
+        'Expected benefits for soil health',
+    ], ('crops', 'region')),
+    PlanSection('soil_health', '## 🪱 SOIL HEALTH IMPROVEMENT', [
+        'Composting setup using local materials',
+        'Minimal tillage transition plan',
+        'Natural fertilizer alternatives',
+    ], ('soil_type', 'region')),
+    PlanSection('water', '## 💧 WATER MANAGEMENT', [
+        'Rainwater harvesting techniques',
+        'Mulching strategies',
+        'Drought-resistant practices',
+    ], ('soil_type', 'region', 'temperature', 'humidity', 'season_outlook')),
+    PlanSection('timeline', '## 📅 6-MONTH IMPLEMENTATION TIMELINE', [
+        'Month-by-month action plan',
+        'Priority activities for each month',
+        'Expected outcomes and milestones',
+    ], ('crops', 'soil_type', 'region', 'size_band', 'season_outlook')),
+    PlanSection('costs', '## 💰 COST-EFFECTIVE SOLUTIONS', [
+        'Low-cost implementation options',
+        'Local resource utilization',
+        'Potential cost savings vs current methods',
+    ], ('crops', 'region', 'size_band')),
+]
+
+FIELD_LABELS = {
+    'crops': '🌾 Current Crops',
+    'soil_type': '🏔️ Soil Type',
+    'region': '📍 Region of Kenya',
+    'suited_crops': '✅ Best-Suited Crops For This County',
+    'size_band': '📏 Farm Size',
+    'temperature': '🌡️ Current Temperature (°C, approx.)',
+    'humidity': '💧 Current Humidity (%, approx.)',
+    'season_outlook': '🌧️ Seasonal Rainfall (local records)',
+}
+
+# Acre bands: plans for 2.0 and 2.5 acres read the same, so they share sections
+SIZE_BANDS = [(1, 'under 1 acre'), (5, '1-5 acres'), (20, '5-20 acres'), (float('inf'), 'over 20 acres')]
+
+
+def _normalize(value):
+    return ' '.join(str(value or '').lower().replace('_', ' ').replace('-', ' ').split())
+
+
+def _band(value, step):
+    try:
+        return int(round(float(value) / step) * step)
+    except (TypeError, ValueError):
+        return None
+
+
+def size_band(size):
+    try:
+        acres = float(size)
+    except (TypeError, ValueError):
+        return 'unknown size'
+    return next(label for limit, label in SIZE_BANDS if acres < limit)
+
+
+def section_context(farm_data, weather_data):
+    """Coarse profile every section key is drawn from"""
+    place = get_location_index().resolve(farm_data.get('location'))
+    # Top candidates from the crop × county suitability matrix, best first
+    suited = [crop.replace('_', ' ') for crop in get_suitability_matrix().top_crops(place.county)]
+    return {
+        'crops': _normalize(farm_data.get('crops')),
+        'soil_type': _normalize(farm_data.get('soil_type')),
+        'region': place.region.replace('_', ' '),
+        'suited_crops': ', '.join(suited) or None,
+        'size_band': size_band(farm_data.get('size')),
+        # Same 2°C / 10% buckets as the whole-plan cache key
+        'temperature': _band(weather_data.get('temperature'), 2),
+        'humidity': _band(weather_data.get('humidity'), 10),
+        # Already bucketed to ~50 mm and a five-step anomaly band, so it changes rarely
+        'season_outlook': get_climate_history().outlook(place.county),
+    }
+
+
+def section_inputs(section, context):
+    return {field: context[field] for field in section.key_fields}
+
+
+def section_cache_key(section, context):
+    raw = json.dumps(section_inputs(section, context), sort_keys=True)
+    digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    return f'section:v{SECTION_CACHE_VERSION}:{section.name}:{digest}'
+
+
+def build_section_prompt(section, context):
+    """Prompt for one section; it only sees the fields in the section's cache key"""
+    profile = '\n'.join(f"        {FIELD_LABELS[field]}: {value if value is not None else 'N/A'}"
+                        for field, value in section_inputs(section, context).items())
+    points = '\n'.join(f'        - {point}' for point in section.points)
+    return f"""
+        You are Dr. Sarah Wanjiku, a leading regenerative agriculture expert in Kenya with 15 years of experience helping smallholder farmers. Write one section of a practical 6-month regenerative agriculture transition plan.
+
+        FARM PROFILE:
+{profile}
+
+        SECTION TO WRITE:
+        {section.heading}
+{points}
+
+        CONTEXT: Focus on techniques proven successful in East Africa. Use local plant names where possible (Swahili/English). Consider the farmer has limited capital but strong community connections.
+
+        Start with the exact heading line above and write only this section, with bullet points and practical steps a farmer can immediately implement.
+        """
+
+
+def has_heading(section, text):
+    """Whether text opens with the section heading (any number of '#')"""
+    return text.lstrip('#').strip().upper().startswith(section.heading.lstrip('#').strip().upper())
+
+
+def normalize_section(section, text):
+    """Trim the model's answer and make sure it opens with the section heading"""
+    text = (text or '').strip()
+    if not text:
+        return ''
+    if not has_heading(section, text):
+        text = f'{section.heading}\n{text}'
+    return text
+
+
+def local_section(section, context, store):
+    """Short section from the knowledge store, used when Gemini can't write it"""
+    crop = store.crop(context['crops'])
+    soil = store.practices_by_topic(soil=context['soil_type'])
+    lines = []
+    if section.name == 'rotation' and crop:
+        lines = [f"Rotate {context['crops']} with {', '.join(crop['companion_crops'])}",
+                 f"Plant in: {', '.join(season['label'] for season in crop['planting_seasons'])}"]
+        if context['suited_crops']:
+            lines.append(f"Best suited to your county's rainfall and soil: {context['suited_crops']}")
+    elif section.name == 'cover_crops' and crop:
+        lines = [f"Cover crops that suit {context['crops']}: {', '.join(crop['cover_crops'])}"]
+    elif section.name == 'soil_health':
+        lines = (soil.get('solutions') or soil.get('management') or [])[:3]
+    elif section.name == 'water':
+        lines = ['Apply mulch to retain soil moisture', 'Install simple rainwater collection']
+        if context['season_outlook']:
+            lines.append(context['season_outlook'])
+    elif section.name == 'timeline':
+        lines = ['Month 1-2: test soil and start composting', 'Month 3-4: plant main and cover crops',
+                 'Month 5-6: monitor soil moisture and manage pests organically']
+    elif section.name == 'costs':
+        lines = ['Make compost from crop residues instead of buying fertilizer',
+                 'Share seed and tools through your farmer group']
+    if not lines:
+        lines = ['Detailed advice for this section is unavailable right now; please try again later']
+    return section.heading + '\n' + '\n'.join(f'• {line}' for line in lines)
+
+
+def assemble_plan(texts):
+    return '\n\n'.join(text for text in texts if text) + '\n'
@@ -0,0 +1,179 @@
+# utils/question_cache.py
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+QUESTION_CACHE_SIZE = int(os.getenv('QUESTION_CACHE_SIZE', 2000))
+QUESTION_CACHE_TTL = int(os.getenv('QUESTION_CACHE_TTL', 24 * 3600))
+QUESTION_SIMILARITY_THRESHOLD = float(os.getenv('QUESTION_SIMILARITY_THRESHOLD', 0.7))
+
+NUM_PERMUTATIONS = 64
+BAND_ROWS = 2
+_MERSENNE_PRIME = (1 << 61) - 1
+
+_STOPWORDS = {
+    'a', 'an', 'the', 'to', 'in', 'on', 'at', 'of', 'for', 'and', 'or', 'is', 'are', 'be',
+    'do', 'does', 'i', 'my', 'me', 'we', 'our', 'you', 'your', 'it', 'can', 'should',
+    'how', 'what', 'when', 'which', 'best', 'good', 'please', 'with', 'about', 'tell',
+}
+
+# Words that change the answer however similar the rest of the question is: "when to harvest"
+# is not "when to plant", and "next season" is not "this season". Place and crop names are
+# added from the gazetteer and knowledge base; numbers always count.
+ACTION_WORDS = {
+    'plant', 'sow', 'transplant', 'harvest', 'sell', 'buy', 'store', 'dry', 'spray', 'irrigate', 'water',
+    'weed', 'prune', 'fertilize', 'fertilise', 'apply', 'feed', 'graze', 'plough', 'plow', 'till',
+}
+TIME_WORDS = {
+    'this', 'next', 'last', 'now', 'today', 'tomorrow', 'yesterday', 'early', 'late', 'long', 'short',
+    'january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+    'november', 'december',
+}
+
+
+def _stem(word):
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def question_tokens(question):
+    """Normalized content words of a question"""
+    words = re.findall(r'[a-z0-9]+', (question or '').lower())
+    return frozenset(_stem(word) for word in words if word not in _STOPWORDS)
+
+
+def default_entity_words():
+    """ACTION_WORDS and TIME_WORDS plus every place and crop name the app knows"""
+    from utils.geocoding import get_location_index
+    from utils.knowledge import get_knowledge_store
+
+    words = set(ACTION_WORDS) | TIME_WORDS | get_location_index().place_words()
+    for crop in get_knowledge_store().crops():
+        words.update(re.findall(r'[a-z0-9]+', crop.lower()))
+    return frozenset(_stem(word) for word in words)
+
+
+def _token_hash(token):
+    return struct.unpack('<Q', hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest())[0]
+
+
+def _context_key(plan_context):
+    text = ' '.join((plan_context or '').split())
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class QuestionCache:
+    """Reuses answers for near-duplicate questions using MinHash signatures and LSH buckets
+
+    A near duplicate must also name exactly the same places, crops,
+    numbers, actions and times (`entity_words`) as the stored question.
+    """
+
+    def __init__(self, max_entries=QUESTION_CACHE_SIZE, ttl=QUESTION_CACHE_TTL,
+                 threshold=QUESTION_SIMILARITY_THRESHOLD, seed=1, entity_words=None):
+        self.entity_words = default_entity_words() if entity_words is None else frozenset(entity_words)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        hashes = [_token_hash(f'{seed}:{i}') for i in range(2 * NUM_PERMUTATIONS)]
+        self._perm_a = array('Q', [(h % (_MERSENNE_PRIME - 1)) + 1 for h in hashes[::2]])
+        self._perm_b = array('Q', [h % _MERSENNE_PRIME for h in hashes[1::2]])
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _signature(self, tokens):
+        values = [_token_hash(token) for token in tokens]
+        signature = array('Q', [_MERSENNE_PRIME] * NUM_PERMUTATIONS)
+        for i in range(NUM_PERMUTATIONS):
+            a, b = self._perm_a[i], self._perm_b[i]
+            signature[i] = min((a * v + b) % _MERSENNE_PRIME for v in values)
+        return signature
+
+    def _entities(self, tokens):
+        return frozenset(token for token in tokens if token in self.entity_words or token.isdigit())
+
+    def _band_keys(self, context, signature):
+        return [(context, start, tuple(signature[start:start + BAND_ROWS]))
+                for start in range(0, NUM_PERMUTATIONS, BAND_ROWS)]
+
+    def get(self, question, plan_context=''):
+        """Stored answer for a sufficiently similar earlier question, or None"""
+        tokens = question_tokens(question)
+        if not tokens:
+            return None
+        context = _context_key(plan_context)
+        signature = self._signature(tokens)
+        entities = self._entities(tokens)
+        now = time.time()
+
+        with self._lock:
+            candidates = set()
+            for band in self._band_keys(context, signature):
+                candidates.update(self._buckets.get(band, ()))
+
+            best_id, best_score = None, 0.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry['expires_at'] < now or entry['entities'] != entities:
+                    continue
+                # LSH only proposes candidates; the exact Jaccard score decides
+                score = len(tokens & entry['tokens']) / len(tokens | entry['tokens'])
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self._stats['hits'] += 1
+            return self._entries[best_id]['answer']
+
+    def put(self, question, answer, plan_context=''):
+        tokens = question_tokens(question)
+        if not tokens or not answer:
+            return
+        context = _context_key(plan_context)
+        signature = self._signature(tokens)
+        bands = self._band_keys(context, signature)
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = {
+                'tokens': tokens,
+                'entities': self._entities(tokens),
+                'bands': bands,
+                'answer': answer,
+                'expires_at': time.time() + self.ttl,
+            }
+            for band in bands:
+                self._buckets.setdefault(band, set()).add(entry_id)
+            self._stats['stores'] += 1
+
+            while len(self._entries) > self.max_entries:
+                old_id, old_entry = self._entries.popitem(last=False)
+                for band in old_entry['bands']:
+                    bucket = self._buckets.get(band)
+                    if bucket is not None:
+                        bucket.discard(old_id)
+                        if not bucket:
+                            del self._buckets[band]
+                self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,219 @@
+# utils/quick_tips.py
+"""Quick tips for every crop × soil pair, generated ahead of time into a versioned file
+
+Refresh stale or missing entries with:  python -m utils.quick_tips [--force]
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import admission
+from utils.geocoding import PROJECT_ROOT
+from utils.weather_snapshot import write_snapshot, acquire_refresh_lock
+
+logger = logging.getLogger(__name__)
+
+QUICK_TIPS_PATH = os.getenv('QUICK_TIPS_PATH', os.path.join(PROJECT_ROOT, '.cache', 'quick_tips.json'))
+QUICK_TIPS_MAX_AGE = int(os.getenv('QUICK_TIPS_MAX_AGE', 7 * 24 * 3600))
+QUICK_TIPS_WORKERS = int(os.getenv('QUICK_TIPS_WORKERS', 4))
+# How long browsers and proxies may reuse a tips response
+QUICK_TIPS_HTTP_MAX_AGE = int(os.getenv('QUICK_TIPS_HTTP_MAX_AGE', 3600))
+
+QUICK_TIPS_PROMPT = ("Give 3 practical regenerative agriculture tips for {crop} farming on {soil} soil in Kenya. "
+                     "Each tip should be one clear sentence.")
+# Entries generated from a different prompt are regenerated on the next refresh
+PROMPT_VERSION = hashlib.sha256(QUICK_TIPS_PROMPT.encode('utf-8')).hexdigest()[:12]
+ARTIFACT_VERSION = 1
+
+DEFAULT_TIPS = [
+    "Build soil health using compost",
+    "Diversify crops and rotate seasons",
+    "Use cover crops and minimal tillage",
+]
+
+
+def tips_key(crop, soil):
+    return f"{str(crop or '').strip().lower().replace(' ', '_')}|{str(soil or '').strip().lower().replace(' ', '_')}"
+
+
+def quick_tips_prompt(crop, soil):
+    return QUICK_TIPS_PROMPT.format(crop=crop, soil=soil)
+
+
+def local_tips(crop, soil, store):
+    """Three tips from the knowledge store, for pairs Gemini hasn't covered yet"""
+    lines = [p.text for p in store.practices(crop=crop, topic='regenerative_practices')][:2]
+    soil_topics = store.practices_by_topic(soil=soil)
+    lines.extend((soil_topics.get('solutions') or soil_topics.get('management') or [])[:1])
+    for tip in DEFAULT_TIPS:
+        if len(lines) >= 3:
+            break
+        lines.append(tip)
+    return '\n'.join(f"{i}. {line}." for i, line in enumerate(lines[:3], 1))
+
+
+def _etag(entry):
+    return hashlib.sha256(f"{entry['prompt_version']}:{entry['tips']}".encode('utf-8')).hexdigest()[:16]
+
+
+class QuickTips:
+    """Read side of the tips file: constant-time lookup, reloaded when the file is replaced"""
+
+    def __init__(self, store, path=QUICK_TIPS_PATH, check_interval=5.0):
+        self.store = store
+        self.path = path
+        self.check_interval = check_interval
+        self._entries = {}
+        self._mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._stats = {'precomputed': 0, 'local': 0}
+        # Known pairs without a Gemini entry yet are answered from the knowledge store
+        self._local = {tips_key(crop, soil): self._local_entry(crop, soil)
+                       for crop in store.crops() for soil in store.soils()}
+
+    def _local_entry(self, crop, soil):
+        entry = {'tips': local_tips(crop, soil, self.store), 'source': 'local',
+                 'generated_at': None, 'prompt_version': 'local'}
+        entry['etag'] = _etag(entry)
+        return entry
+
+    def _maybe_reload(self):
+        now = time.time()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    artifact = json.load(f)
+                entries = artifact.get('entries', {}) if artifact.get('version') == ARTIFACT_VERSION else {}
+                for entry in entries.values():
+                    entry['etag'] = _etag(entry)
+                self._entries = entries
+                self._mtime = mtime
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read quick tips %s: %s", self.path, e)
+
+    def get(self, crop, soil):
+        """{'tips', 'source', 'generated_at', 'etag'} for a pair; never calls Gemini"""
+        self._maybe_reload()
+        key = tips_key(crop, soil)
+        entry = self._entries.get(key)
+        with self._lock:
+            self._stats['precomputed' if entry is not None else 'local'] += 1
+        if entry is not None:
+            return entry
+        return self._local.get(key) or self._local_entry(crop, soil)
+
+    def stats(self):
+        self._maybe_reload()
+        with self._lock:
+            values = dict(self._stats)
+        values['entries'] = len(self._entries)
+        return values
+
+
+class QuickTipsBuilder:
+    """Generates tips for every crop × soil pair through a bounded pool and writes the file"""
+
+    def __init__(self, advisor, store, path=QUICK_TIPS_PATH, max_workers=QUICK_TIPS_WORKERS,
+                 max_age=QUICK_TIPS_MAX_AGE):
+        self.advisor = advisor
+        self.store = store
+        self.path = path
+        self.max_workers = max_workers
+        self.max_age = max_age
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                artifact = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return artifact.get('entries', {}) if artifact.get('version') == ARTIFACT_VERSION else {}
+
+    def is_stale(self, entry, now):
+        return (entry is None or entry.get('source') != 'gemini'
+                or entry.get('prompt_version') != PROMPT_VERSION
+                or now - entry.get('generated_at', 0) > self.max_age)
+
+    def _generate(self, crop, soil):
+        try:
+            # Background refresh: only uses quota that interactive traffic leaves free
+            with admission.priority('bulk'):
+                return self.advisor.generate_text(quick_tips_prompt(crop, soil))
+        except Exception as e:
+            logger.warning("Quick tips for %s on %s failed: %s", crop, soil, e)
+            return None
+
+    def refresh(self, force=False):
+        """Regenerate missing and stale pairs; failed pairs keep their previous entry. Returns the count"""
+        entries = self._load()
+        now = time.time()
+        pairs = [(crop, soil) for crop in self.store.crops() for soil in self.store.soils()
+                 if force or self.is_stale(entries.get(tips_key(crop, soil)), now)]
+        if not pairs:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            results = list(executor.map(lambda pair: self._generate(*pair), pairs))
+
+        generated = 0
+        for (crop, soil), tips in zip(pairs, results):
+            if tips:
+                entries[tips_key(crop, soil)] = {
+                    'tips': tips,
+                    'source': 'gemini',
+                    'generated_at': time.time(),
+                    'prompt_version': PROMPT_VERSION,
+                }
+                generated += 1
+
+        write_snapshot(self.path, {
+            'version': ARTIFACT_VERSION,
+            'prompt_version': PROMPT_VERSION,
+            'generated_at': time.time(),
+            'entries': entries,
+        })
+        logger.info("Quick tips refreshed: %d/%d pairs", generated, len(pairs))
+        return generated
+
+    def start(self):
+        """Warm the file in a background thread; only one process on the host does the work"""
+        def run():
+            lock_file = acquire_refresh_lock(self.path)
+            if lock_file is None:
+                logger.info("Another process is warming quick tips")
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.exception("Quick tips warm-up failed: %s", e)
+            finally:
+                lock_file.close()
+
+        thread = threading.Thread(target=run, name='quick-tips-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+
+if __name__ == '__main__':
+    import sys
+
+    from utils.gemini_advisor import RegenerativeAdvisor
+    from utils.knowledge import get_knowledge_store
+
+    logging.basicConfig(level=logging.INFO)
+    builder = QuickTipsBuilder(RegenerativeAdvisor(), get_knowledge_store())
+    print(f"Generated {builder.refresh(force='--force' in sys.argv)} quick tips into {builder.path}")
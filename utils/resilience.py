@@ -0,0 +1,158 @@
+# utils/resilience.py
+import logging
+import os
+import threading
+import time
+
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worst-case time a request may spend waiting on weather + Gemini before falling back
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 25))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))
+
+BREAKER_TRANSITIONS = metrics.Counter('regai_breaker_transitions_total', 'Circuit breaker state changes')
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before an upstream call finished"""
+
+
+class CircuitOpenError(RuntimeError):
+    """The upstream is failing; callers should use their fallback without calling it"""
+
+
+class Deadline:
+    """Time budget for one request, shared by every upstream stage it calls"""
+
+    def __init__(self, budget=REQUEST_DEADLINE):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap=None):
+        """Seconds a stage may take: what's left of the budget, at most `cap`"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f'request deadline of {self.budget}s exceeded')
+        return remaining if cap is None else min(cap, remaining)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one trial call through after a cool-down
+
+    States: closed (calls allowed), open (calls rejected until reset_timeout
+    has passed), half_open (one trial call; success closes, failure re-opens).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {'rejected': 0, 'failures': 0, 'successes': 0, 'opened': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def _transition(self, state):
+        logger.warning("Circuit %s: %s -> %s", self.name, self._state, state)
+        BREAKER_TRANSITIONS.inc(circuit=self.name, state=state)
+        self._state = state
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+            self._stats['opened'] += 1
+        self._trial_in_flight = False
+
+    def allow(self):
+        """Whether a call may go upstream now; in half-open state only one trial at a time"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def release(self):
+        """Give back a half-open trial whose call was abandoned without an outcome"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._stats['successes'] += 1
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                    self._state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._transition(self.OPEN)
+
+    def stats(self):
+        with self._lock:
+            values = dict(self._stats)
+            values['state'] = self.STATE_VALUES[self._current_state()]
+            values['consecutive_failures'] = self._failures
+            return values
+
+
+class BreakerGroup:
+    """One unit of work's view of a breaker: however many of its calls fail, the breaker sees one failure
+
+    A plan's sections are generated in parallel; when they all time out
+    together that is one slow plan, not enough evidence to open the circuit
+    for every other caller.
+    """
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return self.breaker.allow()
+
+    def release(self):
+        self.breaker.release()
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self):
+        with self._lock:
+            first, self._failed = not self._failed, True
+        if first:
+            self.breaker.record_failure()
+        else:
+            # Already counted; only hand back a half-open trial this call may hold
+            self.breaker.release()
@@ -0,0 +1,116 @@
+# utils/startup.py
+"""Startup timing and readiness for the app process
+
+Per-module import cost:  python -m utils.startup App --top 15
+"""
+import argparse
+import re
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STARTED_AT = time.perf_counter()
+
+_lock = threading.Lock()
+_phases = {}
+_components = {}
+_ready_seconds = None
+
+
+@contextmanager
+def phase(name):
+    """Record how long a block of startup work took"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _phases[name] = time.perf_counter() - start
+
+
+def component(name, state, seconds=None):
+    """Track a lazily initialised component: 'lazy', 'ready' or 'error'"""
+    with _lock:
+        _components[name] = {'state': state, 'init_seconds': seconds}
+
+
+def mark_ready():
+    global _ready_seconds
+    with _lock:
+        if _ready_seconds is None:
+            _ready_seconds = time.perf_counter() - STARTED_AT
+
+
+def is_ready():
+    return _ready_seconds is not None
+
+
+def report():
+    with _lock:
+        return {
+            'ready': _ready_seconds is not None,
+            'startup_seconds': round(_ready_seconds, 4) if _ready_seconds is not None else None,
+            'uptime_seconds': round(time.perf_counter() - STARTED_AT, 1),
+            'phases': {name: round(seconds, 4) for name, seconds in _phases.items()},
+            'components': {name: dict(info) for name, info in _components.items()},
+        }
+
+
+def stats():
+    """Numeric view of the report for /metrics"""
+    with _lock:
+        values = {'ready_seconds': _ready_seconds or 0.0}
+        values.update({f'{name}_seconds': seconds for name, seconds in _phases.items()})
+        for name, info in _components.items():
+            values[f'{name}_ready'] = 1 if info['state'] == 'ready' else 0
+            if info['init_seconds'] is not None:
+                values[f'{name}_init_seconds'] = info['init_seconds']
+        return values
+
+
+_IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def import_costs(module, python=sys.executable):
+    """Cumulative import time (seconds) of each top-level package imported by `module`"""
+    result = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed')
+
+    costs, children = {}, []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, name = int(match.group(1)), int(match.group(2)), match.group(4)
+        # importtime indents two spaces per level and prints children before their parent
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 1:
+            children.append((name, cumulative_us))
+        elif depth == 0:
+            if name == module:
+                costs[f'{name} (own code)'] = self_us / 1e6
+                for child, child_us in children:
+                    costs[child] = costs.get(child, 0.0) + child_us / 1e6
+            # Anything else at depth 0 is interpreter startup, not the app
+            children = []
+    return sorted(costs.items(), key=lambda item: item[1], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('module', nargs='?', default='App')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args(argv)
+
+    costs = import_costs(args.module)
+    for name, seconds in costs[:args.top]:
+        print(f'{seconds * 1000:>10.1f} ms  {name}')
+    print(f'{sum(seconds for _, seconds in costs) * 1000:>10.1f} ms  total')
+
+
+if __name__ == '__main__':
+    main()
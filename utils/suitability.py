@@ -0,0 +1,122 @@
+# utils/suitability.py
+"""Crop × county suitability, scored for every pair in one vectorized NumPy pass"""
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils import startup
+from utils.knowledge import get_knowledge_store
+
+# pH units outside a crop's range at which the pH fit reaches 0
+SUITABILITY_PH_TOLERANCE = float(os.getenv('SUITABILITY_PH_TOLERANCE', 1.5))
+# Fraction below the low / above the high rainfall edge at which the rainfall fit reaches 0;
+# crops cope with surplus rain better than with a shortfall
+SUITABILITY_DRY_TOLERANCE = float(os.getenv('SUITABILITY_DRY_TOLERANCE', 0.5))
+SUITABILITY_WET_TOLERANCE = float(os.getenv('SUITABILITY_WET_TOLERANCE', 1.0))
+# Candidates shown to Gemini in the plan prompt
+SUITABILITY_TOP_N = int(os.getenv('SUITABILITY_TOP_N', 3))
+
+
+def range_fit(values, low, high, below, above):
+    """(rows, columns) fit: 1 inside [low, high], falling linearly to 0 at `below`/`above` past an edge
+
+    values are per column; low, high, below and above are per row.
+    """
+    values = values[np.newaxis, :]
+    shortfall = np.maximum(low[:, np.newaxis] - values, 0) / below[:, np.newaxis]
+    excess = np.maximum(values - high[:, np.newaxis], 0) / above[:, np.newaxis]
+    return np.clip(1 - shortfall - excess, 0, 1)
+
+
+def score_matrix(crop_ph, crop_rainfall, county_ph, county_rainfall):
+    """(ph_fit, rainfall_fit, score) arrays of shape (crops, counties)
+
+    crop_ph and crop_rainfall are (crops, 2) [low, high] ranges, county_ph and
+    county_rainfall are (counties,). The score is the geometric mean of the two
+    fits, so a crop that fails either one is unsuitable.
+    """
+    ph_low, ph_high = crop_ph[:, 0], crop_ph[:, 1]
+    rain_low, rain_high = crop_rainfall[:, 0], crop_rainfall[:, 1]
+    ph_tolerance = np.full(len(crop_ph), SUITABILITY_PH_TOLERANCE)
+    ph_fit = range_fit(county_ph, ph_low, ph_high, ph_tolerance, ph_tolerance)
+    rainfall_fit = range_fit(county_rainfall, rain_low, rain_high,
+                             rain_low * SUITABILITY_DRY_TOLERANCE, rain_high * SUITABILITY_WET_TOLERANCE)
+    score = np.nan_to_num(np.sqrt(ph_fit * rainfall_fit))
+    return ph_fit, rainfall_fit, score
+
+
+def _ranges(store, crops, field):
+    # A crop without a parsable range fits everywhere on that factor
+    return np.array([(store.crop_ranges(crop) or {}).get(field) or (-np.inf, np.inf) for crop in crops],
+                    dtype=float).reshape(-1, 2)
+
+
+class SuitabilityMatrix:
+    """Precomputed scores for every crop in every county with climate data; lookups are one column sort"""
+
+    def __init__(self, store):
+        self.store = store
+        self.crops = store.crops()
+        profiles = store.county_profiles()
+        self.counties = list(profiles)
+        self._columns = {county: i for i, county in enumerate(self.counties)}
+        self._rows = {crop: i for i, crop in enumerate(self.crops)}
+
+        start = time.perf_counter()
+        self.ph_fit, self.rainfall_fit, self.scores = score_matrix(
+            _ranges(store, self.crops, 'soil_ph'),
+            _ranges(store, self.crops, 'rainfall_mm'),
+            np.array([profiles[county]['soil_ph'] for county in self.counties], dtype=float),
+            np.array([profiles[county]['rainfall_mm'] for county in self.counties], dtype=float),
+        )
+        self.compute_seconds = time.perf_counter() - start
+
+    def _entry(self, row, column, **names):
+        return dict(names, score=round(float(self.scores[row, column]), 3),
+                    ph_fit=round(float(self.ph_fit[row, column]), 3),
+                    rainfall_fit=round(float(self.rainfall_fit[row, column]), 3))
+
+    def for_county(self, county, limit=None):
+        """Crops ranked for a county, best first; [] for a county without climate data"""
+        entry = self.store.county(county)
+        column = self._columns.get(entry['name']) if entry else None
+        if column is None:
+            return []
+        order = np.argsort(-self.scores[:, column], kind='stable')[:limit]
+        return [self._entry(row, column, crop=self.crops[row]) for row in order]
+
+    def for_crop(self, crop, limit=None):
+        """Counties ranked for a crop, best first; [] for an unknown crop"""
+        row = self._rows.get(str(crop or '').strip().lower().replace(' ', '_').replace('-', '_'))
+        if row is None:
+            return []
+        order = np.argsort(-self.scores[row], kind='stable')[:limit]
+        return [self._entry(row, column, county=self.counties[column]) for column in order]
+
+    def top_crops(self, county, limit=SUITABILITY_TOP_N):
+        """Names of the best-suited crops for a county, leaving out ones that score 0"""
+        return [entry['crop'] for entry in self.for_county(county, limit) if entry['score'] > 0]
+
+    def stats(self):
+        return {
+            'crops': len(self.crops),
+            'counties': len(self.counties),
+            'compute_seconds': round(self.compute_seconds, 6),
+        }
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def get_suitability_matrix():
+    """Shared matrix, scored once per process from the knowledge store"""
+    global _matrix
+    if _matrix is None:
+        with _matrix_lock:
+            if _matrix is None:
+                _matrix = SuitabilityMatrix(get_knowledge_store())
+                startup.component('suitability', 'ready', round(_matrix.compute_seconds, 4))
+    return _matrix
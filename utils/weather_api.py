@@ -2,28 +2,24 @@
 import requests
 import os
 
+from utils.geocoding import get_location_index
+
 def get_weather_data(location):
     api_key = os.getenv('OPENWEATHER_API_KEY')
     
-    # Get coordinates for location (simplified)
-    kenya_locations = {
-        'nakuru': {'lat': -0.3031, 'lon': 36.0800},
-        'meru': {'lat': 0.0467, 'lon': 37.6550},
-        'kisumu': {'lat': -0.0917, 'lon': 34.7680}
-    }
-    
-    coords = kenya_locations.get(location.lower().split()[0], 
-                                {'lat': -1.2921, 'lon': 36.8219})  # Default to Nairobi
+    # Get coordinates for location (unknown places default to Nairobi)
+    locations = get_location_index()
+    _, lat, lon = locations.weather_point(locations.resolve(location))
     
     url = f"http://api.openweathermap.org/data/2.5/weather"
     params = {
-        'lat': coords['lat'],
-        'lon': coords['lon'],
+        'lat': lat,
+        'lon': lon,
         'appid': api_key,
         'units': 'metric'
     }
     
-    response = requests.get(url, params=params)
+    response = requests.get(url, params=params, timeout=(3, 5))
     data = response.json()
     
     return {
@@ -1,54 +1,245 @@
 # utils/weather_service.py
-import requests
+import asyncio
+import logging
 import os
+import threading
+import weakref
+
+from utils.cache import TTLCache
+from utils.geocoding import get_location_index
+from utils.weather_snapshot import WeatherSnapshot
+from utils import metrics
+from utils.concurrency import AsyncSingleFlight
+from utils.resilience import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', 600))
+WEATHER_CONNECT_TIMEOUT = float(os.getenv('WEATHER_CONNECT_TIMEOUT', 3))
+WEATHER_READ_TIMEOUT = float(os.getenv('WEATHER_READ_TIMEOUT', 5))
+
+FALLBACK_WEATHER = {
+    'temperature': 22,
+    'humidity': 65,
+    'description': 'partly cloudy',
+    'rainfall': 0,
+    'stale': True,
+    # Marks placeholder readings, which old-but-real snapshot weather ('stale' only) is not
+    'fallback': True
+}
+
+
+def is_fallback_weather(weather_data):
+    """True for the placeholder weather served when OpenWeather can't be reached"""
+    return bool(weather_data.get('fallback'))
+
+
+def build_session(pool_size=20):
+    """Keep-alive HTTP session with a connection pool sized for worker threads"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class _InFlight:
+    """A pending upstream fetch that concurrent callers can wait on"""
 
-class WeatherService:
     def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class WeatherService:
+    def __init__(self, session=None, cache_ttl=WEATHER_CACHE_TTL, snapshot=None):
         self.api_key = os.getenv('OPENWEATHER_API_KEY')
-        self.base_url = "http://api.openweathermap.org/data/2.5"
-    
-    def get_location_weather(self, location):
+        self.base_url = os.getenv('OPENWEATHER_BASE_URL', "http://api.openweathermap.org/data/2.5")
+        self.snapshot = snapshot if snapshot is not None else WeatherSnapshot()
+        self._session = session
+        self.timeout = (WEATHER_CONNECT_TIMEOUT, WEATHER_READ_TIMEOUT)
+        self.locations = get_location_index()
+        self.cache = TTLCache(max_entries=512, ttl=cache_ttl)
+        self._inflight = {}
+        self._async_inflight = AsyncSingleFlight()
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {'snapshot_hits': 0, 'cache_hits': 0, 'coalesced': 0, 'fetched': 0, 'errors': 0}
+
+    @property
+    def session(self):
+        """HTTP session, built on the first upstream fetch"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = build_session()
+        return self._session
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def resolve_location(self, location):
+        """Return (cache key, coordinates) for a location name"""
+        # Unknown places default to Nairobi; nearby farms share one grid cell
+        place = self.locations.resolve(location)
+        cell, lat, lon = self.locations.weather_point(place)
+        return cell, {'lat': lat, 'lon': lon}
+
+    def _timeout(self, deadline):
+        """(connect, read) timeouts, shortened to fit what's left of the request deadline"""
+        if deadline is None:
+            return self.timeout
+        try:
+            remaining = deadline.timeout()
+        except DeadlineExceeded:
+            return None
+        return (min(WEATHER_CONNECT_TIMEOUT, remaining), min(WEATHER_READ_TIMEOUT, remaining))
+
+    def get_location_weather(self, location, deadline=None):
         """Get current weather for Kenyan location"""
-        
-        # Kenya county coordinates (simplified)
-        kenya_coords = {
-            'nakuru': {'lat': -0.3031, 'lon': 36.0800},
-            'kiambu': {'lat': -1.1748, 'lon': 36.8356},
-            'machakos': {'lat': -1.5177, 'lon': 37.2634},
-            'kakamega': {'lat': 0.2827, 'lon': 34.7519},
-            'kisumu': {'lat': -0.0917, 'lon': 34.7680},
-            'meru': {'lat': 0.0467, 'lon': 37.6550},
-            'uasin_gishu': {'lat': 0.5143, 'lon': 35.2698},
-            'kitui': {'lat': -1.3667, 'lon': 38.0167}
-        }
-        
-        # Default to Nairobi if location not found
-        coords = kenya_coords.get(location.lower().replace(' ', '_'), 
-                                 {'lat': -1.2921, 'lon': 36.8219})
-        
+        key, coords = self.resolve_location(location)
+
+        # Counties kept fresh by the background refresher never hit the network here
+        snapshot_weather = self.snapshot.get(key)
+        if snapshot_weather is not None:
+            self._count('snapshot_hits')
+            return snapshot_weather
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count('cache_hits')
+            return dict(cached)
+
+        with self._lock:
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[key] = _InFlight()
+
+        timeout = self._timeout(deadline)
+        if not leader:
+            # Another thread is already fetching this location
+            self._count('coalesced')
+            pending.done.wait(deadline.remaining() if deadline is not None else sum(self.timeout) + 1)
+            if pending.result is None:
+                metrics.count_fallback('weather')
+            return dict(pending.result or FALLBACK_WEATHER)
+
         try:
-            response = requests.get(f"{self.base_url}/weather", params={
-                'lat': coords['lat'],
-                'lon': coords['lon'],
-                'appid': self.api_key,
-                'units': 'metric'
-            })
-            
+            weather = self._fetch(coords, timeout) if timeout else None
+            if weather is not None:
+                self.cache.set(key, weather)
+            else:
+                metrics.count_fallback('weather')
+            pending.result = weather or FALLBACK_WEATHER
+        finally:
+            pending.done.set()
+            with self._lock:
+                self._inflight.pop(key, None)
+
+        return dict(pending.result)
+
+    async def get_location_weather_async(self, location, deadline=None):
+        """Async version of get_location_weather; shares its snapshot, cache and counters"""
+        key, coords = self.resolve_location(location)
+
+        snapshot_weather = self.snapshot.get(key)
+        if snapshot_weather is not None:
+            self._count('snapshot_hits')
+            return snapshot_weather
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count('cache_hits')
+            return dict(cached)
+
+        timeout = self._timeout(deadline)
+
+        async def fetch():
+            weather = await self._fetch_async(coords, timeout) if timeout else None
+            if weather is not None:
+                self.cache.set(key, weather)
+            else:
+                metrics.count_fallback('weather')
+            return weather or FALLBACK_WEATHER
+
+        weather, coalesced = await self._async_inflight.run(key, fetch)
+        if coalesced:
+            self._count('coalesced')
+        return dict(weather)
+
+    def _async_client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            timeout = httpx.Timeout(WEATHER_READ_TIMEOUT, connect=WEATHER_CONNECT_TIMEOUT)
+            client = self._async_clients[loop] = httpx.AsyncClient(timeout=timeout)
+        return client
+
+    async def _fetch_async(self, coords, timeout=None):
+        """Async fetch from OpenWeather, or None on failure"""
+        import httpx
+
+        connect_timeout, read_timeout = timeout or self.timeout
+        self._count('fetched')
+        try:
+            with metrics.timed('weather_fetch'):
+                response = await self._async_client().get(f"{self.base_url}/weather", params={
+                    'lat': coords['lat'],
+                    'lon': coords['lon'],
+                    'appid': self.api_key,
+                    'units': 'metric'
+                }, timeout=httpx.Timeout(read_timeout, connect=connect_timeout))
+
             if response.status_code == 200:
-                data = response.json()
-                return {
-                    'temperature': round(data['main']['temp'], 1),
-                    'humidity': data['main']['humidity'],
-                    'description': data['weather'][0]['description'],
-                    'rainfall': data.get('rain', {}).get('1h', 0)
-                }
+                return self._parse(response.json())
+            logger.warning("Weather API returned HTTP %s", response.status_code)
+            metrics.ERRORS.inc(component='weather', type=f'http_{response.status_code}')
         except Exception as e:
-            print(f"Weather API error: {e}")
-        
-        # Fallback data
+            logger.warning("Weather API error: %s", e)
+            metrics.count_error('weather', e)
+
+        self._count('errors')
+        return None
+
+    def _parse(self, data):
         return {
-            'temperature': 22,
-            'humidity': 65,
-            'description': 'partly cloudy',
-            'rainfall': 0
-        }
\ No newline at end of file
+            'temperature': round(data['main']['temp'], 1),
+            'humidity': data['main']['humidity'],
+            'description': data['weather'][0]['description'],
+            'rainfall': data.get('rain', {}).get('1h', 0),
+            'stale': False
+        }
+
+    def _fetch(self, coords, timeout=None):
+        """Fetch current conditions from OpenWeather, or None on failure"""
+        self._count('fetched')
+        try:
+            with metrics.timed('weather_fetch'):
+                response = self.session.get(f"{self.base_url}/weather", params={
+                    'lat': coords['lat'],
+                    'lon': coords['lon'],
+                    'appid': self.api_key,
+                    'units': 'metric'
+                }, timeout=timeout or self.timeout)
+
+            if response.status_code == 200:
+                return self._parse(response.json())
+            logger.warning("Weather API returned HTTP %s", response.status_code)
+            metrics.ERRORS.inc(component='weather', type=f'http_{response.status_code}')
+        except Exception as e:
+            logger.warning("Weather API error: %s", e)
+            metrics.count_error('weather', e)
+
+        self._count('errors')
+        return None
@@ -0,0 +1,193 @@
+# utils/weather_snapshot.py
+"""Background refresh of county weather into a snapshot file shared by all workers
+
+Run standalone with:  python -m utils.weather_snapshot [--once]
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process refresh lock
+    fcntl = None
+
+from utils.geocoding import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+WEATHER_SNAPSHOT_PATH = os.getenv('WEATHER_SNAPSHOT_PATH', os.path.join(PROJECT_ROOT, '.cache', 'weather_snapshot.json'))
+WEATHER_REFRESH_INTERVAL = int(os.getenv('WEATHER_REFRESH_INTERVAL', 900))
+WEATHER_REFRESH_WORKERS = int(os.getenv('WEATHER_REFRESH_WORKERS', 8))
+# Entries older than this are still served, but flagged as stale
+WEATHER_SNAPSHOT_MAX_AGE = int(os.getenv('WEATHER_SNAPSHOT_MAX_AGE', 2 * WEATHER_REFRESH_INTERVAL))
+
+
+def write_snapshot(path, snapshot):
+    """Atomically replace the snapshot file so readers never see a partial write"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def acquire_refresh_lock(path):
+    """Non-blocking host-wide lock next to `path`; returns the open lock file, or None if held elsewhere
+
+    Keep the returned file open for as long as the lock is needed.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    lock_file = open(path + '.lock', 'w')
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except OSError:
+        lock_file.close()
+        return None
+
+
+class WeatherSnapshot:
+    """Read side of the snapshot; reloads whenever another process replaces the file"""
+
+    def __init__(self, path=WEATHER_SNAPSHOT_PATH, max_age=WEATHER_SNAPSHOT_MAX_AGE, check_interval=1.0):
+        self.path = path
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self._cells = {}
+        self._mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self):
+        now = time.time()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.path) as f:
+                    self._cells = json.load(f).get('cells', {})
+                self._mtime = mtime
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read weather snapshot %s: %s", self.path, e)
+
+    def get(self, cell):
+        """Weather dict with a 'stale' flag, or None if the cell is not in the snapshot"""
+        self._maybe_reload()
+        entry = self._cells.get(cell)
+        if entry is None:
+            return None
+        weather = dict(entry['weather'])
+        weather['stale'] = time.time() - entry['fetched_at'] > self.max_age
+        return weather
+
+    def cells(self):
+        self._maybe_reload()
+        return dict(self._cells)
+
+
+class WeatherRefresher:
+    """Periodically fetches weather for every county cell and writes the snapshot
+
+    With a ClimateHistory, each county's observation is also folded into its daily series.
+    """
+
+    def __init__(self, weather_service, counties, path=WEATHER_SNAPSHOT_PATH,
+                 interval=WEATHER_REFRESH_INTERVAL, max_workers=WEATHER_REFRESH_WORKERS, history=None):
+        self.weather_service = weather_service
+        self.history = history
+        self.counties = counties
+        self.path = path
+        self.interval = interval
+        self.max_workers = max_workers
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_once(self):
+        """Fetch all county cells concurrently; cells that fail keep their previous entry"""
+        points = {}
+        county_cells = {}
+        for county in self.counties:
+            cell, coords = self.weather_service.resolve_location(county)
+            points[cell] = coords
+            county_cells[county] = cell
+
+        previous = WeatherSnapshot(self.path).cells()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(points, executor.map(self.weather_service._fetch, points.values())))
+
+        now = time.time()
+        cells = dict(previous)
+        for cell, weather in results.items():
+            if weather is not None:
+                cells[cell] = {'weather': weather, 'fetched_at': now}
+
+        write_snapshot(self.path, {'generated_at': now, 'cells': cells})
+        if self.history is not None:
+            for county, cell in county_cells.items():
+                try:
+                    self.history.record(county, results.get(cell), interval=self.interval)
+                except Exception as e:
+                    logger.warning("Could not record climate history for %s: %s", county, e)
+        fetched = sum(1 for weather in results.values() if weather is not None)
+        logger.info("Weather snapshot refreshed: %d/%d cells", fetched, len(results))
+        return fetched
+
+    def run(self):
+        # Only one process on the host refreshes; the others just read the snapshot
+        self._lock_file = acquire_refresh_lock(self.path)
+        if self._lock_file is None:
+            logger.info("Another process is refreshing the weather snapshot")
+            return
+        while not self._stop.is_set():
+            try:
+                self.refresh_once()
+            except Exception as e:
+                logger.exception("Weather snapshot refresh failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name='weather-refresher', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+
+
+def kenyan_region_counties():
+    from utils.knowledge import get_knowledge_store
+    regions = get_knowledge_store().featured_regions
+    return [county for counties in regions.values() for county in counties]
+
+
+if __name__ == '__main__':
+    from utils.climate_history import get_climate_history
+    from utils.weather_service import WeatherService
+
+    logging.basicConfig(level=logging.INFO)
+    refresher = WeatherRefresher(WeatherService(), kenyan_region_counties(), history=get_climate_history())
+    if '--once' in sys.argv:
+        refresher.refresh_once()
+    else:
+        refresher.run()